@@ -0,0 +1,81 @@
+"""Image work run in the server's process pool.
+
+The pool uses spawn, so each worker imports the module its functions come from.
+This one has no side effects on import (no database client, app or directories),
+unlike server.py, and takes every path it writes to as an argument.
+"""
+from typing import Dict, List, Tuple
+import io
+import math
+import os
+import uuid
+from pathlib import Path
+from PIL import Image, ImageOps
+
+IMAGE_VARIANT_WIDTHS = {"thumb": 160, "medium": 480, "large": 1024, "full": None}  # full: same size, served for the original when accepted
+IMAGE_VARIANT_QUALITY = 80
+
+# Sprite sheet tiles, drawn from the thumb variants (see plan_sprite_sheets in server.py)
+SPRITE_TILE_WIDTH = IMAGE_VARIANT_WIDTHS["thumb"]
+SPRITE_TILE_HEIGHT = 224
+
+def image_variant_formats() -> List[str]:
+    Image.init()
+    return ["webp"] + (["avif"] if "AVIF" in Image.SAVE else [])
+
+def write_file_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+def generate_image_variants(source_path: str, variants_dir: str) -> Dict[str, Dict[str, str]]:
+    """Write every size and format of an image to variants_dir; returns their URLs by size and format.
+
+    Images are never upscaled.
+    """
+    source = Path(source_path)
+    variants_dir = Path(variants_dir)
+    variants = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    for size, width in IMAGE_VARIANT_WIDTHS.items():
+        resized = image.copy()
+        if width is not None:
+            resized.thumbnail((width, width * 2), Image.LANCZOS)
+        variants[size] = {}
+        for image_format in image_variant_formats():
+            filename = f"{source.stem}-{size}.{image_format}"
+            tmp_path = variants_dir / f".{uuid.uuid4().hex}.tmp"
+            try:
+                resized.save(tmp_path, format=image_format.upper(), quality=IMAGE_VARIANT_QUALITY)
+                os.replace(tmp_path, variants_dir / filename)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            variants[size][image_format] = f"/uploads/variants/{filename}"
+    return variants
+
+def draw_sprite_sheet(tiles: List[Tuple[str, str]], columns: int, path: str):
+    """Draw one sprite sheet of (card id, image path) tiles and write it to path.
+
+    A tile whose image cannot be read is left blank.
+    """
+    rows = math.ceil(len(tiles) / columns)
+    sheet = Image.new("RGBA", (columns * SPRITE_TILE_WIDTH, rows * SPRITE_TILE_HEIGHT), (0, 0, 0, 0))
+    for index, (_, source) in enumerate(tiles):
+        try:
+            with Image.open(source) as image:
+                image.draft("RGB", (SPRITE_TILE_WIDTH, SPRITE_TILE_HEIGHT))  # JPEG originals decode at a reduced size
+                tile = ImageOps.contain(ImageOps.exif_transpose(image).convert("RGBA"), (SPRITE_TILE_WIDTH, SPRITE_TILE_HEIGHT), Image.LANCZOS)
+        except (OSError, ValueError) as e:
+            print(f"Warning: leaving {source} out of the sprite sheet: {e}")
+            continue
+        x = (index % columns) * SPRITE_TILE_WIDTH
+        y = (index // columns) * SPRITE_TILE_HEIGHT
+        sheet.paste(tile, (x + (SPRITE_TILE_WIDTH - tile.width) // 2, y + (SPRITE_TILE_HEIGHT - tile.height) // 2))
+
+    buffer = io.BytesIO()
+    sheet.save(buffer, format="WEBP", quality=IMAGE_VARIANT_QUALITY)
+    write_file_atomic(Path(path), buffer.getvalue())
@@ -1,15 +1,60 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pymongo import MongoClient
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, StreamingResponse
+from starlette.staticfiles import NotModifiedResponse
+from pymongo import ASCENDING, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import os
+import re
 import json
+import asyncio
+import functools
+import gzip
+import math
+import hashlib
+import time
+import http.client
+import ipaddress
+import socket
+import urllib.error
+import urllib.parse
+import urllib.request
+import base64
+import bisect
 import uuid
 import shutil
+import threading
+import csv
+import zipfile
+import zlib
+import codecs
+import stat
+import fcntl
+from email.utils import formatdate, parsedate
+from mimetypes import guess_type
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 import random
+import multiprocessing
+import numpy as np
+import orjson
+# Worker functions live in their own module, so spawned image workers don't import this one
+from image_workers import (
+    IMAGE_VARIANT_QUALITY, SPRITE_TILE_HEIGHT, SPRITE_TILE_WIDTH,
+    draw_sprite_sheet, generate_image_variants, write_file_atomic
+)
+
+try:
+    import brotli
+except ImportError:  # Optional: brotli responses are offered only when installed
+    brotli = None
 
 app = FastAPI()
 
@@ -34,13 +79,656 @@ cards_collection = db.cards
 collections_db = db.card_collections  # Renamed to avoid conflict with MongoDB collections
 users_collection = db.users
 user_collections_collection = db.user_collections
+pack_pulls_collection = db.pack_pulls  # Append-only pull history, one event per pack
+image_blobs_collection = db.image_blobs  # Uploaded image files by content hash, with reference counts
+jobs_collection = db.jobs  # Status and progress of background jobs (cascading collection deletes)
+catalog_versions_collection = db.catalog_versions  # Shared catalog version counters, see catalog_version
+
+# Optional expiry for pull history, in days (unset keeps it forever)
+PULL_HISTORY_TTL_DAYS = os.environ.get('PULL_HISTORY_TTL_DAYS')
+
+# Blocking pymongo calls run on a bounded thread pool, so the event loop keeps
+# serving requests while queries are in flight
+MONGO_THREADS = int(os.environ.get('MONGO_THREADS', '32'))
+db_executor = ThreadPoolExecutor(max_workers=MONGO_THREADS, thread_name_prefix="mongo")
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database call on the Mongo thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
 
 # Create uploads directory
 uploads_dir = Path("/app/backend/uploads")
 uploads_dir.mkdir(exist_ok=True)
 
-# Serve static files
-app.mount("/uploads", StaticFiles(directory="/app/backend/uploads"), name="uploads")
+# Serve static files. Content-addressed names (see the image store and the catalog
+# bundles) never change, so they are cached for a year without revalidation; other
+# files are revalidated against a strong ETag. Range requests are honoured, and a
+# precompressed sibling (name.gz / name.br) or a same-size WebP/AVIF alternate
+# (variants/<stem>-full.<format>) is served when the client accepts it.
+STATIC_CHUNK_BYTES = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+NEGOTIABLE_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif")
+CONTENT_ADDRESSED_UPLOAD = re.compile(r"^[0-9a-f]{64}-[0-9a-f]{8}(-\w+)?\.\w+$")
+BYTE_RANGE = re.compile(r"(?P<first>[0-9]*)-(?P<last>[0-9]*)")
+
+def accepts_media_type(request_headers, media_type: str) -> bool:
+    """Whether the Accept header names this media type explicitly (wildcards don't count)"""
+    for item in request_headers.get("accept", "").split(","):
+        value, _, params = item.strip().partition(";")
+        if value.strip().lower() == media_type:
+            return params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def read_file_range(path: str, start: int, end: int):
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(STATIC_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with cache headers, conditional and Range requests, and negotiated alternates"""
+    
+    def __init__(self, *, immutable_names: re.Pattern, precompressed: bool = False, alternates_dir: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.immutable_names = immutable_names
+        self.precompressed = precompressed
+        self.alternates_dir = alternates_dir
+    
+    async def exists(self, path: str) -> bool:
+        stat_result = (await run_in_threadpool(self.lookup_path, path))[1]
+        return stat_result is not None and stat.S_ISREG(stat_result.st_mode)
+    
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        request = Request(scope)
+        served_path = path
+        media_type = None
+        headers = {}
+        vary = []
+        
+        if self.alternates_dir and path.lower().endswith(NEGOTIABLE_IMAGE_SUFFIXES):
+            vary.append("Accept")
+            stem = os.path.splitext(os.path.basename(path))[0]
+            for image_format in ("avif", "webp"):
+                alternate = f"{self.alternates_dir}/{stem}-full.{image_format}"
+                if accepts_media_type(request.headers, f"image/{image_format}") and await self.exists(alternate):
+                    served_path, media_type = alternate, f"image/{image_format}"
+                    break
+        
+        if self.precompressed:
+            vary.append("Accept-Encoding")
+            available = [encoding for encoding, suffix in PRECOMPRESSED_SUFFIXES.items() if await self.exists(served_path + suffix)]
+            encoding = choose_encoding(request, available)
+            if encoding != "identity":
+                media_type = media_type or guess_type(served_path)[0]
+                served_path += PRECOMPRESSED_SUFFIXES[encoding]
+                headers["Content-Encoding"] = encoding
+        
+        full_path, stat_result = await run_in_threadpool(self.lookup_path, served_path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        
+        digest = hashlib.md5(f"{served_path}:{stat_result.st_mtime_ns}:{stat_result.st_size}".encode()).hexdigest()
+        etag = f'"{digest}"'
+        headers.update({
+            "ETag": etag,
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if self.immutable_names.match(os.path.basename(path)) else "no-cache"
+        })
+        if vary:
+            headers["Vary"] = ", ".join(vary)
+        
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                return NotModifiedResponse(Headers(headers))
+        elif "if-modified-since" in request.headers:
+            if_modified_since = parsedate(request.headers["if-modified-since"])
+            if if_modified_since is not None and if_modified_since >= parsedate(headers["Last-Modified"]):
+                return NotModifiedResponse(Headers(headers))
+        
+        # Single byte ranges only; anything else, including a malformed range, gets the whole file
+        size = stat_result.st_size
+        range_header = request.headers.get("range", "")
+        units, _, spec = range_header.partition("=")
+        if units.strip().lower() == "bytes" and request.headers.get("if-range", etag) == etag:
+            match = BYTE_RANGE.fullmatch(spec.strip())
+            start = end = None
+            if match and match["first"] and (not match["last"] or int(match["last"]) >= int(match["first"])):
+                start = int(match["first"])
+                end = min(int(match["last"]), size - 1) if match["last"] else size - 1
+            elif match and not match["first"] and match["last"]:
+                start, end = max(size - int(match["last"]), 0), size - 1
+            if start is not None:
+                # Well-formed but outside the file (or an empty suffix)
+                if start > end or start >= size:
+                    headers["Content-Range"] = f"bytes */{size}"
+                    return Response(status_code=416, headers=headers)
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                media_type = media_type or guess_type(served_path)[0] or "application/octet-stream"
+                if scope["method"] == "HEAD":
+                    return Response(status_code=206, headers=headers, media_type=media_type)
+                return StreamingResponse(read_file_range(full_path, start, end), status_code=206, headers=headers, media_type=media_type)
+        
+        return FileResponse(full_path, stat_result=stat_result, method=scope["method"], headers=headers, media_type=media_type)
+
+app.mount("/uploads", CachedStaticFiles(directory="/app/backend/uploads", immutable_names=CONTENT_ADDRESSED_UPLOAD, alternates_dir="variants"), name="uploads")
+
+# Image uploads are streamed to a temp file in uploads_dir (same filesystem, so
+# the final move is atomic) and only moved into place once the card is stored
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+UPLOAD_TEMP_MAX_AGE = 3600  # seconds before an abandoned temp file is swept at startup
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif")
+]
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """File extension for the image format in the first bytes of a file, if supported"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return None
+
+class ImageSink:
+    """Writes an image to a temp file in uploads_dir, sniffing its type, hashing it and enforcing the size cap"""
+    
+    def __init__(self):
+        self.tmp_path = uploads_dir / f".upload-{uuid.uuid4().hex}.tmp"
+        self.extension = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.buffer = open(self.tmp_path, "wb")
+    
+    def write(self, chunk: bytes):
+        if self.extension is None:
+            self.extension = sniff_image_type(chunk)
+            if self.extension is None:
+                raise HTTPException(status_code=400, detail="Unsupported image type. Upload a PNG, JPEG, GIF, WebP or AVIF image.")
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image is larger than {UPLOAD_MAX_BYTES} bytes")
+        self.digest.update(chunk)
+        self.buffer.write(chunk)
+    
+    def finish(self) -> Tuple[Path, str, str]:
+        """Close the temp file; returns its path, the sniffed extension and the SHA-256"""
+        self.buffer.close()
+        if self.extension is None:
+            raise HTTPException(status_code=400, detail="Image is empty")
+        return self.tmp_path, self.extension, self.digest.hexdigest()
+    
+    def discard(self):
+        self.buffer.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+# Starlette's multipart parser spools every file part to its own temp file before
+# the handler runs, so the size cap is enforced on the request body itself while
+# it is received: a Content-Length over the limit is refused before any of the
+# body is read, and a body that grows past it (chunked, or a wrong header) is cut
+# off. The limit leaves room for the other form fields and multipart framing.
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+UPLOAD_LIMITED_ROUTES = {("POST", "/api/cards")}
+
+class UploadLimitMiddleware:
+    """Answer 413 for request bodies over max_bytes on the given (method, path) routes, before they are parsed"""
+    
+    def __init__(self, app, routes: set, max_bytes: int):
+        self.app = app
+        self.routes = routes
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length", "")
+        received = 0
+        
+        # Raised from inside the handler's body parsing, so the 413 goes through
+        # the usual exception handling (and CORS) like any other HTTPException
+        async def limited_receive():
+            nonlocal received
+            if content_length.isdigit() and int(content_length) > self.max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload is larger than {self.max_bytes} bytes")
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload is larger than {self.max_bytes} bytes")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadLimitMiddleware, routes=UPLOAD_LIMITED_ROUTES, max_bytes=UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD)
+
+async def stream_upload(upload: UploadFile) -> Tuple[Path, str, str]:
+    """Copy an upload from the parser's spool file to a temp file in uploads_dir, sniffing and hashing it on the way"""
+    sink = await run_in_threadpool(ImageSink)
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            await run_in_threadpool(sink.write, chunk)
+        return await run_in_threadpool(sink.finish)
+    except BaseException:
+        await run_in_threadpool(sink.discard)
+        raise
+
+# Resized WebP (and AVIF, when a Pillow AVIF plugin is installed) copies of
+# uploaded card images, written to uploads/variants by a process pool so the
+# resizing neither blocks the event loop nor contends for the GIL
+variants_dir = uploads_dir / "variants"
+variants_dir.mkdir(exist_ok=True)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', str(min(4, os.cpu_count() or 1))))
+image_executor: Optional[ProcessPoolExecutor] = None
+image_executor_lock = threading.Lock()
+background_tasks = set()
+
+def get_image_executor() -> ProcessPoolExecutor:
+    global image_executor
+    # Called from executor threads as well as the event loop
+    with image_executor_lock:
+        if image_executor is None:
+            # spawn, not fork: the server process has Mongo and executor threads running
+            image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return image_executor
+
+def upload_path(image_url: Optional[str]) -> Optional[Path]:
+    """Local file behind an /uploads/ URL, or None for external images"""
+    if not image_url or not image_url.startswith("/uploads/"):
+        return None
+    return uploads_dir / image_url[len("/uploads/"):]
+
+def remove_image_variants(image_path: Path):
+    for variant_path in variants_dir.glob(f"{image_path.stem}-*"):
+        variant_path.unlink(missing_ok=True)
+
+async def generate_card_variants(card: Dict[str, Any]):
+    """Build the image variants of a card with an uploaded image and record them on the card"""
+    source = upload_path(card.get("image_url"))
+    if source is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+        variants = await loop.run_in_executor(get_image_executor(), generate_image_variants, str(source), str(variants_dir))
+        # Only if the card still shows this image
+        updated = await run_db(
+            cards_collection.find_one_and_update,
+            {"id": card["id"], "image_url": card["image_url"]},
+            {"$set": {"image_variants": variants}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated is not None:
+            await catalog_card_saved(updated)
+    except Exception as e:
+        print(f"Warning: could not generate image variants for card {card['id']}: {e}")
+
+def schedule_card_variants(card: Dict[str, Any]):
+    task = asyncio.create_task(generate_card_variants(card))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def backfill_image_variants(force: bool = False) -> int:
+    """Generate variants for stored cards with uploaded images that lack them"""
+    query = {"image_url": {"$regex": "^/uploads/"}}
+    if not force:
+        query["image_variants"] = None
+    cards = list(cards_collection.find(query, {"_id": 0, "id": 1, "image_url": 1, "collection_id": 1}))
+    
+    generated = 0
+    changed = set()
+    with ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(generate_image_variants, str(upload_path(card["image_url"])), str(variants_dir)): card for card in cards}
+        for future in as_completed(futures):
+            card = futures[future]
+            try:
+                variants = future.result()
+            except Exception as e:
+                print(f"Warning: could not generate image variants for card {card['id']}: {e}")
+                continue
+            result = cards_collection.update_one({"id": card["id"], "image_url": card["image_url"]}, {"$set": {"image_variants": variants}})
+            if result.modified_count:
+                changed.add(card["collection_id"])
+            generated += 1
+    # Running servers reload these collections on their next read
+    for collection_id in changed:
+        bump_catalog_version(collection_id)
+    return generated
+
+# Content-addressed image store. Uploads are stored once per distinct content
+# as <sha256>-<token>.<ext>, with an image_blobs document counting the cards that
+# use the file. The last release deletes the document and then the file; the
+# token is new for every document, so an upload racing that release writes a
+# different file instead of one that is about to be unlinked.
+def acquire_image_blob(tmp_path: Path, extension: str, sha256: str) -> str:
+    """Take a reference to the blob with this content, storing the temp file if it is new; returns its URL"""
+    candidate = f"{sha256}-{uuid.uuid4().hex[:8]}.{extension}"
+    acquire = functools.partial(
+        image_blobs_collection.find_one_and_update,
+        {"sha256": sha256},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {"filename": candidate, "size": tmp_path.stat().st_size, "created_at": datetime.now(timezone.utc)}
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    try:
+        blob = acquire()
+    except DuplicateKeyError:
+        # Lost an upsert race with an identical first upload; the document exists now
+        blob = acquire()
+    if blob["filename"] == candidate:
+        os.replace(tmp_path, uploads_dir / candidate)
+    else:
+        tmp_path.unlink(missing_ok=True)
+    return f"/uploads/{blob['filename']}"
+
+def acquire_image_reference(image_url: str):
+    """Take another reference to a stored image; local URLs outside the blob store are refused"""
+    path = upload_path(image_url)
+    blob = image_blobs_collection.find_one_and_update(
+        {"filename": path.name, "refs": {"$gt": 0}}, {"$inc": {"refs": 1}}
+    )
+    if blob is None:
+        raise ValueError(f"{image_url} is not a stored image")
+
+def release_image(image_url: Optional[str], count: int = 1):
+    """Drop `count` card references to an image, deleting the file (and its variants) with the last one"""
+    path = upload_path(image_url)
+    if path is None:
+        return
+    blob = image_blobs_collection.find_one_and_update(
+        {"filename": path.name}, {"$inc": {"refs": -count}}, return_document=ReturnDocument.AFTER
+    )
+    if blob is None:
+        # Stored before the blob store (named after the card), so not shared
+        path.unlink(missing_ok=True)
+        remove_image_variants(path)
+    elif blob["refs"] <= 0:
+        delete_unreferenced_blob(path.name)
+
+def delete_unreferenced_blob(filename: str) -> bool:
+    # Deleting the document first means a concurrent acquire either kept it alive
+    # (no match here) or creates a new document with a new filename
+    result = image_blobs_collection.delete_one({"filename": filename, "refs": {"$lte": 0}})
+    if result.deleted_count == 0:
+        return False
+    (uploads_dir / filename).unlink(missing_ok=True)
+    remove_image_variants(uploads_dir / filename)
+    return True
+
+def gc_uploads(grace_seconds: int = UPLOAD_TEMP_MAX_AGE) -> Dict[str, int]:
+    """Remove unreferenced blobs, and upload and variant files nothing points to.
+    
+    Files younger than the grace period are kept, since an upload may be
+    between writing its file and storing its card.
+    """
+    removed = {"blobs": 0, "files": 0, "variants": 0}
+    for blob in list(image_blobs_collection.find({"refs": {"$lte": 0}}, {"_id": 0, "filename": 1})):
+        removed["blobs"] += delete_unreferenced_blob(blob["filename"])
+    
+    referenced = {blob["filename"] for blob in image_blobs_collection.find({}, {"_id": 0, "filename": 1})}
+    for card in cards_collection.find({"image_url": {"$regex": "^/uploads/"}}, {"_id": 0, "image_url": 1}):
+        referenced.add(upload_path(card["image_url"]).name)
+    stems = {Path(filename).stem for filename in referenced}
+    
+    cutoff = datetime.now().timestamp() - grace_seconds
+    for path in uploads_dir.iterdir():
+        if path.is_file() and not path.name.startswith(".") and path.name not in referenced and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed["files"] += 1
+    for path in variants_dir.iterdir():
+        stem = path.name.rsplit("-", 1)[0]
+        if path.is_file() and not path.name.startswith(".") and stem not in stems and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed["variants"] += 1
+    return removed
+
+# Mirroring of URL-based card images. A card created from a URL keeps it as
+# source_image_url and is served from that URL until a background fetch has
+# stored the image in the blob store; then image_url points at the local copy.
+# Mirrors are revalidated with conditional GETs (ETag / Last-Modified) and a
+# failed fetch leaves the card on whatever image it was already serving.
+# Anyone can submit a URL, so fetches only connect to public addresses (checked
+# on every connection, redirects included) and, when MIRROR_ALLOWED_HOSTS is
+# set, only to those hosts and their subdomains.
+MIRROR_CONCURRENCY = int(os.environ.get('MIRROR_CONCURRENCY', '4'))
+MIRROR_TIMEOUT = float(os.environ.get('MIRROR_TIMEOUT', '10'))  # seconds
+MIRROR_REVALIDATE_SECONDS = int(os.environ.get('MIRROR_REVALIDATE_SECONDS', str(24 * 3600)))
+MIRROR_ALLOWED_HOSTS = [host.strip().lower() for host in os.environ.get('MIRROR_ALLOWED_HOSTS', '').split(',') if host.strip()]
+MIRROR_ALLOW_PRIVATE = os.environ.get('MIRROR_ALLOW_PRIVATE', '').lower() in ('1', 'true', 'yes')  # for local testing
+mirror_executor = ThreadPoolExecutor(max_workers=MIRROR_CONCURRENCY, thread_name_prefix="mirror")
+
+def is_remote_url(url: Optional[str]) -> bool:
+    return bool(url) and urllib.parse.urlsplit(url).scheme in ("http", "https")
+
+def connect_mirror_origin(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection for mirror fetches: refuses hosts outside the allowlist or
+    resolving to non-public addresses, and connects to the address it checked"""
+    host, port = address
+    if MIRROR_ALLOWED_HOSTS and not any(host.lower() == allowed or host.lower().endswith("." + allowed) for allowed in MIRROR_ALLOWED_HOSTS):
+        raise ValueError(f"Image host {host} is not allowed")
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    if not MIRROR_ALLOW_PRIVATE:
+        for ip in map(ipaddress.ip_address, addresses):
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError(f"Image host {host} resolves to a non-public address")
+    return socket.create_connection((addresses[0], port), timeout, source_address)
+
+class MirrorHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_mirror_origin
+
+class MirrorHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_mirror_origin  # TLS still verifies against the host name
+
+class MirrorHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(MirrorHTTPConnection, req)
+
+class MirrorHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(MirrorHTTPSConnection, req, context=self._context)
+
+# Only http(s), redirects included, and no proxies from the environment
+mirror_opener = urllib.request.OpenerDirector()
+for handler in (MirrorHTTPHandler(), MirrorHTTPSHandler(), urllib.request.HTTPRedirectHandler(),
+                urllib.request.HTTPDefaultErrorHandler(), urllib.request.HTTPErrorProcessor()):
+    mirror_opener.add_handler(handler)
+
+def fetch_remote_image(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Conditional GET of a remote image into a temp file; None when the origin answers 304"""
+    headers = {"User-Agent": "tcg-pocket-image-mirror"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        response = mirror_opener.open(urllib.request.Request(url, headers=headers), timeout=MIRROR_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
+    
+    with response:
+        sink = ImageSink()
+        try:
+            while True:
+                chunk = response.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                sink.write(chunk)
+            tmp_path, extension, sha256 = sink.finish()
+        except BaseException:
+            sink.discard()
+            raise
+        return {
+            "tmp_path": tmp_path,
+            "extension": extension,
+            "sha256": sha256,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+
+async def mirror_card_image(card_id: str):
+    """Fetch or revalidate the local copy of a card's remote image"""
+    card = await run_db(cards_collection.find_one, {"id": card_id}, {"_id": 0})
+    if card is None or not is_remote_url(card.get("source_image_url")):
+        return
+    mirror = card.get("image_mirror") or {}
+    mirrored = upload_path(card.get("image_url")) is not None
+    now = datetime.now(timezone.utc)
+    
+    try:
+        loop = asyncio.get_running_loop()
+        fetched = await loop.run_in_executor(
+            mirror_executor, fetch_remote_image, card["source_image_url"],
+            mirror.get("etag") if mirrored else None, mirror.get("last_modified") if mirrored else None
+        )
+    except Exception as e:
+        error = getattr(e, "detail", None) or str(e)
+        print(f"Warning: could not mirror image for card {card_id}: {error}")
+        await run_db(
+            cards_collection.update_one,
+            {"id": card_id, "source_image_url": card["source_image_url"]},
+            {"$set": {"image_mirror": dict(mirror, checked_at=now, error=error)}}
+        )
+        return
+    
+    if fetched is None:
+        # Unchanged at the origin
+        await run_db(
+            cards_collection.update_one,
+            {"id": card_id, "source_image_url": card["source_image_url"]},
+            {"$set": {"image_mirror": dict(mirror, checked_at=now, error=None)}}
+        )
+        return
+    
+    try:
+        image_url = await run_db(acquire_image_blob, fetched["tmp_path"], fetched["extension"], fetched["sha256"])
+    finally:
+        fetched["tmp_path"].unlink(missing_ok=True)
+    updates = {
+        "image_url": image_url,
+        "image_mirror": {"etag": fetched["etag"], "last_modified": fetched["last_modified"], "checked_at": now, "error": None}
+    }
+    if image_url != card["image_url"]:
+        updates["image_variants"] = None
+    result = await run_db(
+        cards_collection.update_one,
+        {"id": card_id, "image_url": card["image_url"], "source_image_url": card["source_image_url"], "deleting": {"$ne": True}},
+        {"$set": updates}
+    )
+    
+    # Give back the reference this fetch took if the card changed meanwhile or the
+    # content is the one already served, and the old image's if it was replaced
+    if result.matched_count == 0 or image_url == card["image_url"]:
+        await run_db(release_image, image_url)
+        return
+    await run_db(release_image, card["image_url"])
+    card.update(updates)
+    await catalog_card_saved(card)
+    schedule_card_variants(card)
+
+def schedule_image_mirror(card_id: str):
+    task = asyncio.create_task(mirror_card_image(card_id))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def revalidate_image_mirrors(max_age: int = MIRROR_REVALIDATE_SECONDS) -> int:
+    """Mirror or revalidate every URL-based card image last checked more than max_age seconds ago"""
+    # Cards created from URLs before mirroring existed
+    await run_db(
+        cards_collection.update_many,
+        {"image_url": {"$regex": "^https?://"}, "source_image_url": None},
+        [{"$set": {"source_image_url": "$image_url"}}]
+    )
+    cutoff = datetime.now(timezone.utc).timestamp() - max_age
+    card_ids = await run_db(lambda: [
+        card["id"] for card in cards_collection.find(
+            {
+                "source_image_url": {"$regex": "^https?://"},
+                "$or": [
+                    {"image_mirror.checked_at": None},
+                    {"image_mirror.checked_at": {"$lt": datetime.fromtimestamp(cutoff, timezone.utc)}}
+                ]
+            },
+            {"_id": 0, "id": 1}
+        )
+    ])
+    # Concurrency is bounded by the mirror executor
+    await asyncio.gather(*(mirror_card_image(card_id) for card_id in card_ids))
+    return len(card_ids)
+
+# One worker sweeps per interval: the sweep is claimed through a lease document
+# in db.jobs, which also survives restarts, so a restart neither skips nor
+# repeats a sweep that is due
+MIRROR_LEASE_ID = "mirror-revalidation"
+MIRROR_LEASE_POLL_SECONDS = min(MIRROR_REVALIDATE_SECONDS, 600)
+
+def claim_mirror_revalidation() -> bool:
+    """Take the revalidation lease for one interval; False while another worker holds it"""
+    now = datetime.now(timezone.utc)
+    try:
+        # With the lease held the filter misses, and the upsert hits the unique id index
+        jobs_collection.update_one(
+            {"id": MIRROR_LEASE_ID, "lease_until": {"$lt": now}},
+            {"$set": {
+                "type": "mirror_revalidation",
+                "status": "running",
+                "lease_until": now + timedelta(seconds=MIRROR_REVALIDATE_SECONDS),
+                "updated_at": now
+            }},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def revalidate_image_mirrors_forever():
+    while True:
+        try:
+            if await run_db(claim_mirror_revalidation):
+                checked = await revalidate_image_mirrors()
+                await run_db(update_job, MIRROR_LEASE_ID, {"status": "completed", "cards_checked": checked})
+        except Exception as e:
+            print(f"Warning: image mirror revalidation failed: {e}")
+        await asyncio.sleep(MIRROR_LEASE_POLL_SECONDS)
+
+def sweep_upload_temp_files():
+    """Remove temp files left behind by uploads interrupted by a crash"""
+    cutoff = datetime.now().timestamp() - UPLOAD_TEMP_MAX_AGE
+    for tmp_path in uploads_dir.glob(".upload-*.tmp"):
+        try:
+            if tmp_path.stat().st_mtime < cutoff:
+                tmp_path.unlink()
+        except FileNotFoundError:
+            pass
 
 # Rarity probabilities (like real Pokémon packs)
 RARITY_PROBABILITIES = {
@@ -53,6 +741,818 @@ RARITY_PROBABILITIES = {
 }
 
 CARDS_PER_PACK = 6  # 6 cards per pack
+MAX_PACKS_PER_REQUEST = 100  # Upper bound for /api/open-packs
+MAX_PAGE_SIZE = 500  # Upper bound for paginated listings
+
+MAX_COPIES_PER_PACK = 2  # A card can appear at most twice in the same pack
+GUARANTEED_CARD_TYPES = ["Energy", "Trainer"]  # Every pack starts with one of each
+
+class AliasTable:
+    """Vose's alias method: constant-time draws from a fixed discrete distribution"""
+
+    def __init__(self, outcomes: List[Any], weights: List[float]):
+        count = len(outcomes)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights]
+        self.outcomes = outcomes
+        self.prob = [1.0] * count
+        self.alias = list(range(count))
+        
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng=random):
+        column = rng.randrange(len(self.outcomes))
+        if rng.random() < self.prob[column]:
+            return self.outcomes[column]
+        return self.outcomes[self.alias[column]]
+
+class CardGroup:
+    """Cards sharing a type or rarity, drawn uniformly while skipping capped cards"""
+
+    def __init__(self):
+        self.cards = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def add(self, card: Dict[str, Any]):
+        self.positions[card["id"]] = len(self.cards)
+        self.cards.append(card)
+
+    def available(self, capped: set) -> int:
+        return len(self.cards) - sum(1 for card_id in capped if card_id in self.positions)
+
+    def draw(self, capped: set, rng=random) -> Optional[Dict[str, Any]]:
+        """Pick a card not in ``capped``; costs O(len(capped)), never retries"""
+        skipped = sorted(self.positions[card_id] for card_id in capped if card_id in self.positions)
+        remaining = len(self.cards) - len(skipped)
+        if remaining <= 0:
+            return None
+        # Map the index onto the cards that are left by stepping over capped positions
+        index = rng.randrange(remaining)
+        for position in skipped:
+            if index < position:
+                break
+            index += 1
+        return self.cards[index]
+
+# Resident pack pools, one per collection. Built on the first pack open and
+# patched in place by this worker's card writes, so opening a pack only has to
+# check the shared catalog version instead of querying the catalog.
+class PackPool:
+    """Cards of one collection grouped the way open_pack draws them"""
+
+    def __init__(self, collection: Dict[str, Any], cards: List[Dict[str, Any]], catalog_version: int = 0):
+        self.collection = collection
+        self.cards_by_id = {card["id"]: card for card in cards}
+        self.catalog_version = catalog_version  # Version of the catalog these cards were read at
+        self._regroup()
+
+    def _regroup(self):
+        self.all_cards = CardGroup()
+        self.cards_by_type = {}
+        self.cards_by_rarity = {}
+        for card in self.cards_by_id.values():
+            self._add_to_groups(card)
+        self._rarity_tables = {}
+
+    def _add_to_groups(self, card: Dict[str, Any]):
+        self.all_cards.add(card)
+        self.cards_by_type.setdefault(card["card_type"], CardGroup()).add(card)
+        self.cards_by_rarity.setdefault(card["rarity"], CardGroup()).add(card)
+
+    def put_card(self, card: Dict[str, Any]):
+        """Add a new card or replace an existing one with the same id"""
+        if card["id"] in self.cards_by_id:
+            self.cards_by_id[card["id"]] = card
+            self._regroup()
+            return
+        self.cards_by_id[card["id"]] = card
+        self._add_to_groups(card)
+        self._rarity_tables = {}
+
+    def remove_card(self, card_id: str):
+        if self.cards_by_id.pop(card_id, None) is not None:
+            self._regroup()
+
+    def rarity_table(self, exhausted: frozenset) -> Optional[AliasTable]:
+        """Alias table over the rarities that still have cards, renormalized.
+        
+        Tables are compiled once per set of exhausted rarities; with a 2-copy cap
+        and 6-card packs only a handful of such sets can ever occur.
+        """
+        if exhausted not in self._rarity_tables:
+            rarities = [
+                rarity for rarity, prob in RARITY_PROBABILITIES.items()
+                if prob > 0 and rarity in self.cards_by_rarity and rarity not in exhausted
+            ]
+            self._rarity_tables[exhausted] = AliasTable(
+                rarities, [RARITY_PROBABILITIES[rarity] for rarity in rarities]
+            ) if rarities else None
+        return self._rarity_tables[exhausted]
+
+    def draw_slot(self, card_type: Optional[str], capped: set, rng=random) -> Optional[Dict[str, Any]]:
+        """Draw the card for one slot: a guaranteed card type, or rarity-weighted when None"""
+        if card_type is not None:
+            # Fall back to any card when the collection has none of this type
+            return (self.cards_by_type.get(card_type) or self.all_cards).draw(capped, rng)
+        
+        # A rarity whose cards are all capped is dropped from the table instead of being re-rolled
+        exhausted = frozenset(
+            rarity for rarity in {self.cards_by_id[card_id]["rarity"] for card_id in capped}
+            if not self.cards_by_rarity[rarity].available(capped)
+        )
+        table = self.rarity_table(exhausted)
+        if table is None:
+            return self.all_cards.draw(capped, rng)
+        return self.cards_by_rarity[table.sample(rng)].draw(capped, rng)
+
+    def roll_pack(self, rng=random):
+        """Roll one pack, returning the pulled cards and copies per card id"""
+        pulled_cards = []
+        card_counts = {}
+        capped = set()  # Cards already at MAX_COPIES_PER_PACK in this pack
+        
+        def take(card):
+            if card is None:
+                return
+            pulled_cards.append(card)
+            card_counts[card["id"]] = card_counts.get(card["id"], 0) + 1
+            if card_counts[card["id"]] >= MAX_COPIES_PER_PACK:
+                capped.add(card["id"])
+        
+        for card_type in GUARANTEED_CARD_TYPES:
+            take(self.draw_slot(card_type, capped, rng))
+        
+        # Fill the remaining slots by rarity
+        for _ in range(CARDS_PER_PACK - len(pulled_cards)):
+            take(self.draw_slot(None, capped, rng))
+        
+        return pulled_cards, card_counts
+
+pack_pools: Dict[str, PackPool] = {}
+
+def get_pack_pool(collection_id: str) -> Optional[PackPool]:
+    """Return the pack pool for a collection at its current catalog version, (re)loading it when stale"""
+    version = catalog_version(collection_id)
+    while True:
+        pool = pack_pools.get(collection_id)
+        if pool is not None and pool.catalog_version == version:
+            return pool
+        collection = collections_db.find_one({"id": collection_id}, {"_id": 0})
+        if not collection:
+            pack_pools.pop(collection_id, None)
+            return None
+        cards = list(cards_collection.find({"collection_id": collection_id}, {"_id": 0}))
+        # A card written while the pool was loading may be missing from it; load again
+        loaded_version, version = version, catalog_version(collection_id)
+        if version != loaded_version:
+            continue
+        pool = PackPool(collection, cards, version)
+        pack_pools[collection_id] = pool
+        return pool
+
+# Catalog versions: one counter per collection, plus CATALOG_SCOPE for endpoints
+# that read across collections. The counters live in Mongo and every card or
+# collection write increments them after it lands, so all workers and the
+# maintenance commands share them. Everything derived from the catalog (pack
+# pools, cached responses and their ETags, pack odds, bundles) is tagged with
+# the version it was read at and rebuilt once the shared version moves on.
+CATALOG_SCOPE = "*"
+
+def catalog_version(scope: str) -> int:
+    document = catalog_versions_collection.find_one({"scope": scope}, {"_id": 0, "version": 1})
+    return document["version"] if document else 0
+
+def catalog_versions_of(scopes: List[str]) -> Dict[str, int]:
+    return {
+        document["scope"]: document["version"]
+        for document in catalog_versions_collection.find({"scope": {"$in": scopes}}, {"_id": 0})
+    }
+
+def bump_catalog_version(collection_id: str) -> int:
+    """Increment the shared versions of a collection and of CATALOG_SCOPE; returns the collection's new version"""
+    version = None
+    for scope in (collection_id, CATALOG_SCOPE):
+        increment = functools.partial(
+            catalog_versions_collection.find_one_and_update,
+            {"scope": scope}, {"$inc": {"version": 1}},
+            projection={"_id": 0, "version": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        try:
+            document = increment()
+        except DuplicateKeyError:
+            document = increment()  # Another writer created the counter first
+        if version is None:
+            version = document["version"]
+    return version
+
+# Serialized catalog responses, cached per worker against the shared catalog
+# version. The ETag is that version, so it is the same whichever worker answers.
+CATALOG_CACHE_MAX_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+class CatalogCache:
+    """LRU cache of response bodies, bounded by total size and keyed by catalog version"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> (scope, version, {content-coding: body})
+
+    def get(self, key: tuple, version: int) -> Optional[Dict[str, bytes]]:
+        entry = self.entries.get(key)
+        if entry is None or entry[1] != version:
+            return None
+        self.entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: tuple, scope: str, version: int, variants: Dict[str, bytes]):
+        size = sum(len(body) for body in variants.values())
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self.entries[key] = (scope, version, variants)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def discard_scope(self, scope: str):
+        for key in [key for key, entry in self.entries.items() if entry[0] == scope]:
+            self._remove(key)
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= sum(len(body) for body in entry[2].values())
+
+catalog_cache = CatalogCache(CATALOG_CACHE_MAX_BYTES)
+
+# Response compression. Bodies below the threshold are sent as they are;
+# brotli is offered only when the optional brotli package is installed.
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def supported_encodings() -> List[str]:
+    """Content codings the server can produce, most preferred first"""
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+def choose_encoding(request: Request, available) -> str:
+    """Best content coding both sides support, or identity"""
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+def encoded_response(request: Request, variants: Dict[str, bytes], headers: Dict[str, str], status_code: int = 200) -> Response:
+    encoding = choose_encoding(request, variants)
+    headers = dict(headers, Vary="Accept-Encoding")
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=variants[encoding], status_code=status_code, media_type="application/json", headers=headers)
+
+def encode_json(payload: Any, encodings: List[str]) -> Dict[str, bytes]:
+    """Serialize with orjson, adding the given content codings when the body is large enough to compress"""
+    body = orjson.dumps(payload)
+    variants = {"identity": body}
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        for encoding in encodings:
+            variants[encoding] = compress_body(body, encoding)
+    return variants
+
+async def json_response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """Serialize with orjson and compress on the fly when the client accepts it"""
+    # Off the event loop: a large listing takes long enough to serialize and
+    # compress to hold up every other request on this worker
+    encoding = choose_encoding(request, supported_encodings())
+    variants = await run_in_threadpool(encode_json, payload, [encoding] if encoding != "identity" else [])
+    return encoded_response(request, variants, {}, status_code)
+
+async def catalog_response(request: Request, key: tuple, scope: str, build) -> Response:
+    """Serve a catalog read from the cache, answering 304 when the client's ETag is current"""
+    version = await run_db(catalog_version, scope)
+    etag = f'W/"catalog-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    variants = catalog_cache.get(key, version)
+    if variants is None:
+        # Serialized and compressed once per catalog version, on a thread like json_response
+        variants = await run_in_threadpool(encode_json, await build(), supported_encodings())
+        catalog_cache.put(key, scope, version, variants)
+    return encoded_response(request, variants, headers)
+
+async def catalog_changed(collection_id: str) -> int:
+    """Bump the shared version after a catalog write, drop this worker's stale responses and queue a bundle build"""
+    version = await run_db(bump_catalog_version, collection_id)
+    for scope in (collection_id, CATALOG_SCOPE):
+        catalog_cache.discard_scope(scope)
+    schedule_bundle_build(collection_id)
+    return version
+
+def patch_pack_pool(collection_id: str, version: int, patch):
+    """Apply this worker's write to its pool in place if nothing else changed the catalog since the pool was read"""
+    pool = pack_pools.get(collection_id)
+    if pool is None:
+        return
+    if pool.catalog_version == version - 1:
+        patch(pool)
+        pool.catalog_version = version
+    else:
+        pack_pools.pop(collection_id, None)
+
+async def catalog_card_saved(card: Dict[str, Any]):
+    """Keep catalog caches in step with a created or updated card"""
+    version = await catalog_changed(card["collection_id"])
+    patch_pack_pool(card["collection_id"], version, lambda pool: pool.put_card(card))
+
+async def catalog_card_removed(card: Dict[str, Any]):
+    """Keep catalog caches in step with a deleted card"""
+    version = await catalog_changed(card["collection_id"])
+    patch_pack_pool(card["collection_id"], version, lambda pool: pool.remove_card(card["id"]))
+
+async def catalog_collection_changed(collection_id: str):
+    """Drop everything cached for a collection that was created, deleted or bulk-loaded"""
+    await catalog_changed(collection_id)
+    pack_pools.pop(collection_id, None)
+
+# Pack odds simulation. Packs are rolled in NumPy batches with the same rules as
+# PackPool.roll_pack. The 2-copy cap is applied by redrawing capped cards (and
+# rarities whose cards are all capped) for just the affected packs, which yields
+# the same conditional distribution as PackPool.draw_slot; packs still unresolved
+# after a few rounds are drawn through draw_slot itself.
+SIMULATION_BATCH_SIZE = 100_000
+MAX_SIMULATED_PACKS = 5_000_000
+MAX_REDRAW_ROUNDS = 16
+# Keyed by catalog version, so results for older versions just age out
+PACK_ODDS_CACHE_ENTRIES = 64
+pack_odds_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+pack_odds_lock = threading.Lock()
+
+class PackSimulator:
+    """Vectorized Monte Carlo sampler over a PackPool"""
+
+    def __init__(self, pool: PackPool, seed: Optional[int] = None):
+        # Work on a snapshot so card writes during a long run can't shift the indices
+        pool = PackPool(pool.collection, list(pool.all_cards.cards))
+        self.pool = pool
+        self.cards = pool.all_cards.cards
+        self.rng = np.random.default_rng(seed)
+        self.py_rng = random.Random(int(self.rng.integers(2**63)))
+        self.index_of = {card["id"]: index for index, card in enumerate(self.cards)}
+        
+        all_indices = self._indices(pool.all_cards)
+        self.guaranteed = [
+            self._indices(pool.cards_by_type[card_type]) if card_type in pool.cards_by_type else all_indices
+            for card_type in GUARANTEED_CARD_TYPES
+        ]
+        
+        # Alias table for the rarity slots, flattened into arrays
+        table = pool.rarity_table(frozenset())
+        self.has_rarity_table = table is not None
+        rarities = table.outcomes if table is not None else []
+        groups = [self._indices(pool.cards_by_rarity[rarity]) for rarity in rarities] or [all_indices]
+        self.alias_prob = np.array(table.prob) if table is not None else np.ones(1)
+        self.alias = np.array(table.alias, dtype=np.int64) if table is not None else np.zeros(1, dtype=np.int64)
+        self.group_sizes = np.array([len(group) for group in groups], dtype=np.int64)
+        self.group_starts = np.concatenate(([0], np.cumsum(self.group_sizes)[:-1]))
+        self.group_cards = np.concatenate(groups)
+        # Position of each card's rarity in the alias table (-1 when it is never rolled)
+        self.rarity_of = np.array([
+            rarities.index(card["rarity"]) if card["rarity"] in rarities else -1 for card in self.cards
+        ], dtype=np.int64)
+
+    def _indices(self, group: CardGroup) -> np.ndarray:
+        return np.array([self.index_of[card["id"]] for card in group.cards], dtype=np.int64)
+
+    def _rarities(self, size: int) -> np.ndarray:
+        column = self.rng.integers(len(self.alias_prob), size=size)
+        return np.where(self.rng.random(size) < self.alias_prob[column], column, self.alias[column])
+
+    def _cards_of(self, rarity: np.ndarray) -> np.ndarray:
+        offset = (self.rng.random(len(rarity)) * self.group_sizes[rarity]).astype(np.int64)
+        return self.group_cards[self.group_starts[rarity] + offset]
+
+    def _exhausted(self, rarity: np.ndarray, capped: np.ndarray) -> np.ndarray:
+        # Every capped card appears exactly MAX_COPIES_PER_PACK times in ``capped``
+        same_rarity = (capped >= 0) & (self.rarity_of[capped] == rarity[:, None])
+        return same_rarity.sum(axis=1) // MAX_COPIES_PER_PACK >= self.group_sizes[rarity]
+
+    def _draw_slot(self, card_type: Optional[str], slot: int, capped: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Card indices drawn for one slot, and the packs left for PackPool.draw_slot"""
+        size = len(capped)
+        if card_type is not None:
+            group = self.guaranteed[slot]
+            drawn = group[self.rng.integers(len(group), size=size)]
+            for _ in range(MAX_REDRAW_ROUNDS):
+                redraw = (drawn[:, None] == capped).any(axis=1)
+                if not redraw.any():
+                    break
+                drawn[redraw] = group[self.rng.integers(len(group), size=int(redraw.sum()))]
+            return drawn, redraw
+        
+        if not self.has_rarity_table:
+            return self.group_cards[self.rng.integers(len(self.group_cards), size=size)], (capped >= 0).any(axis=1)
+        
+        # Rarity first, skipping rarities that are exhausted in this pack...
+        rarity = self._rarities(size)
+        for _ in range(MAX_REDRAW_ROUNDS):
+            exhausted = self._exhausted(rarity, capped)
+            if not exhausted.any():
+                break
+            rarity[exhausted] = self._rarities(int(exhausted.sum()))
+        # ...then a card of that rarity, skipping capped cards
+        drawn = self._cards_of(rarity)
+        for _ in range(MAX_REDRAW_ROUNDS):
+            redraw = (drawn[:, None] == capped).any(axis=1) & ~exhausted
+            if not redraw.any():
+                break
+            drawn[redraw] = self._cards_of(rarity[redraw])
+        return drawn, redraw | exhausted
+
+    def roll(self, size: int) -> np.ndarray:
+        """Roll ``size`` packs; returns card indices shaped (size, CARDS_PER_PACK), -1 for empty slots"""
+        picks = np.full((size, CARDS_PER_PACK), -1, dtype=np.int64)
+        slots = GUARANTEED_CARD_TYPES + [None] * (CARDS_PER_PACK - len(GUARANTEED_CARD_TYPES))
+        for slot, card_type in enumerate(slots):
+            previous = picks[:, :slot]
+            copies = (previous[:, :, None] == previous[:, None, :]).sum(axis=2)
+            capped = np.where((previous >= 0) & (copies >= MAX_COPIES_PER_PACK), previous, -1)
+            
+            drawn, unresolved = self._draw_slot(card_type, slot, capped)
+            for row in np.flatnonzero(unresolved):
+                capped_ids = {self.cards[index]["id"] for index in capped[row] if index >= 0}
+                card = self.pool.draw_slot(card_type, capped_ids, self.py_rng)
+                drawn[row] = -1 if card is None else self.index_of[card["id"]]
+            picks[:, slot] = drawn
+        return picks
+
+    def packs_to_complete(self, collectors: int, max_packs: int, chunk: int = 250) -> np.ndarray:
+        """Packs each simulated collector needed to own every card (max_packs + 1 if never)"""
+        first_seen = np.full((collectors, len(self.cards)), max_packs + 1, dtype=np.int64)
+        opened = 0
+        while opened < max_packs and (first_seen.max(axis=1) > max_packs).any():
+            count = min(chunk, max_packs - opened)
+            picks = self.roll(collectors * count).reshape(collectors, count, CARDS_PER_PACK)
+            pack_number = np.broadcast_to(opened + 1 + np.arange(count)[None, :, None], picks.shape)
+            collector = np.broadcast_to(np.arange(collectors)[:, None, None], picks.shape)
+            valid = picks >= 0
+            np.minimum.at(first_seen, (collector[valid], picks[valid]), pack_number[valid])
+            opened += count
+        return first_seen.max(axis=1)
+
+def estimate_packs_to_complete(pack_probability: np.ndarray, horizon: int = 10_000_000) -> Optional[float]:
+    """Expected packs to own every card, treating packs as independent draws of each card.
+    
+    E[T] = sum over t of P(T > t), with P(T <= t) = prod_i (1 - (1 - p_i)^t). Ignores the
+    small correlation between cards within one pack; useful when the simulated
+    collectors can't finish within their pack budget.
+    """
+    if len(pack_probability) == 0 or (pack_probability <= 0).any():
+        return None
+    log_miss = np.log1p(-np.minimum(pack_probability, 1 - 1e-12))
+    expected = 0.0
+    for start in range(0, horizon, 100_000):
+        t = np.arange(start, start + 100_000)[:, None]
+        with np.errstate(divide="ignore"):
+            tail = -np.expm1(np.log1p(-np.exp(t * log_miss)).sum(axis=1))
+        expected += float(tail.sum())
+        if tail[-1] < 1e-9:
+            return expected
+    return None
+
+def simulate_pack_odds(pool: PackPool, packs: int, collectors: int = 100,
+                       max_packs_to_complete: int = 20_000, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Monte Carlo per-card odds and set-completion estimates for a collection"""
+    simulator = PackSimulator(pool, seed)
+    cards = simulator.cards
+    copies = np.zeros(len(cards), dtype=np.int64)
+    packs_with_card = np.zeros(len(cards), dtype=np.int64)
+    
+    remaining = packs
+    while remaining > 0:
+        batch = min(remaining, SIMULATION_BATCH_SIZE)
+        picks = simulator.roll(batch)
+        remaining -= batch
+        
+        copies += np.bincount(picks[picks >= 0], minlength=len(cards))
+        # Count each card once per pack for the inclusion odds
+        ordered = np.sort(picks, axis=1)
+        first = np.ones_like(ordered, dtype=bool)
+        first[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        packs_with_card += np.bincount(ordered[first & (ordered >= 0)], minlength=len(cards))
+    
+    rarity_slots = {}
+    for card, count in zip(cards, copies):
+        rarity_slots[card["rarity"]] = rarity_slots.get(card["rarity"], 0) + int(count)
+    total_slots = int(copies.sum())
+    pack_probability = packs_with_card / packs
+    
+    completion = {
+        "collectors": collectors,
+        "max_packs": max_packs_to_complete,
+        "estimated_expected_packs": estimate_packs_to_complete(pack_probability)
+    }
+    if collectors > 0:
+        finished_at = simulator.packs_to_complete(collectors, max_packs_to_complete)
+        done = finished_at[finished_at <= max_packs_to_complete]
+        completion.update({
+            "completed": int(len(done)),
+            "expected_packs": float(done.mean()) if len(done) == collectors else None,
+            "median_packs": float(np.median(finished_at)) if 2 * len(done) >= collectors else None,
+            "p90_packs": float(np.percentile(finished_at, 90)) if 10 * len(done) >= 9 * collectors else None
+        })
+    
+    return {
+        "collection_id": pool.collection["id"],
+        "collection_name": pool.collection["name"],
+        "packs_simulated": packs,
+        "seed": seed,
+        "cards_per_pack": CARDS_PER_PACK,
+        "rarity_share": {rarity: count / total_slots for rarity, count in rarity_slots.items()} if total_slots else {},
+        "cards": sorted([
+            {
+                "id": card["id"],
+                "name": card["name"],
+                "card_number": card.get("card_number"),
+                "rarity": card["rarity"],
+                "card_type": card["card_type"],
+                "pack_probability": float(pack_probability[index]),
+                "expected_copies_per_pack": int(copies[index]) / packs
+            }
+            for index, card in enumerate(cards)
+        ], key=lambda card: card["card_number"] or 0),
+        "set_completion": completion
+    }
+
+def build_collection_overview(pool: PackPool) -> Dict[str, Dict[str, Any]]:
+    """Overview of every slot in a collection, in full and compact form.
+    
+    The compact form replaces the per-slot list with a presence bitmap (bit
+    n-1 set when card number n exists, least significant bit first, base64)
+    and lists only the cards that exist.
+    """
+    collection = pool.collection
+    total_cards_in_set = collection.get("total_cards_in_set", 50)
+    
+    # Index cards by number; the first card wins if a number is duplicated
+    cards_by_number = {}
+    for card in sorted(pool.all_cards.cards, key=lambda x: x.get("card_number", 0)):
+        cards_by_number.setdefault(card.get("card_number"), card)
+    
+    complete_set = []
+    present = bytearray((total_cards_in_set + 7) // 8)
+    existing_cards = []
+    for i in range(1, total_cards_in_set + 1):
+        found_card = cards_by_number.get(i)
+        complete_set.append({
+            "card_number": i,
+            "exists": found_card is not None,
+            "card": found_card
+        })
+        if found_card is not None:
+            present[(i - 1) // 8] |= 1 << ((i - 1) % 8)
+            existing_cards.append(found_card)
+    
+    return {
+        "full": {
+            "collection": collection,
+            "complete_set": complete_set,
+            "total_cards_in_set": total_cards_in_set,
+            "actual_cards_created": len(pool.all_cards)
+        },
+        "compact": {
+            "collection": collection,
+            "present": base64.b64encode(bytes(present)).decode(),
+            "cards": existing_cards,
+            "total_cards_in_set": total_cards_in_set,
+            "actual_cards_created": len(pool.all_cards)
+        }
+    }
+
+# Static catalog bundles. Each collection's cards and presence bitmap are written
+# to bundles/<collection_id>/<content hash>.json with .gz/.br siblings and served
+# with immutable caching, so clients read the catalog without touching Python
+# handlers or Mongo. Bundles are rebuilt shortly after a catalog change; the hash
+# depends only on the content, so every worker writes the same files. The
+# current bundle is recorded in bundles/<collection_id>/current.json with the
+# catalog version it was read at, which /api/catalog-bundles reads in every
+# worker; a build never replaces a record of a newer version, and a record
+# older than the shared version queues a rebuild. A file is only pruned once
+# no build has touched it for BUNDLE_RETENTION_SECONDS, so a bundle that any
+# worker advertised stays fetchable for at least that long.
+bundles_dir = Path("/app/backend/bundles")
+bundles_dir.mkdir(exist_ok=True)
+BUNDLE_BUILD_DELAY = float(os.environ.get('BUNDLE_BUILD_DELAY', '0.5'))  # seconds; coalesces bursts of edits
+BUNDLE_RETENTION_SECONDS = int(os.environ.get('BUNDLE_RETENTION_SECONDS', '3600'))
+BUNDLE_CURRENT = "current.json"
+BUNDLE_LOCK = ".current.lock"  # Serializes updates of current.json across workers
+bundle_builds: Dict[str, asyncio.Task] = {}
+bundle_entries: Dict[str, Tuple[int, Dict[str, Any]]] = {}  # collection id -> (current.json mtime_ns, entry)
+
+# Card thumbnails of a collection are also packed into WebP sprite sheets of up
+# to SPRITE_SHEET_TILES tiles, stored next to its bundle, so a grid of cards
+# costs a request per hundred cards. Tiles are drawn from the thumb variants.
+# A sheet is named after its inputs (card ids and their content-addressed
+# sources), so an unchanged run of cards keeps its sheet and only sheets whose
+# cards changed are drawn again. The bundle carries each sheet's URL and each
+# card's sheet and tile offset.
+SPRITE_SHEET_TILES = 100  # 10 x 10 tiles, about 14 MB of RGBA while a sheet is drawn
+
+def plan_sprite_sheets(tiles: List[Tuple[str, str]], output_dir: Path) -> Tuple[Dict[str, Any], List[Tuple[List[Tuple[str, str]], int, str]]]:
+    """Layout of the sheets for (card id, image path) tiles, and the (tiles, columns, path) of sheets not drawn yet"""
+    layout = {"tile_width": SPRITE_TILE_WIDTH, "tile_height": SPRITE_TILE_HEIGHT, "sheets": [], "cards": {}}
+    missing = []
+    for start in range(0, len(tiles), SPRITE_SHEET_TILES):
+        chunk = tiles[start:start + SPRITE_SHEET_TILES]
+        columns = math.ceil(math.sqrt(len(chunk)))
+        key = orjson.dumps([SPRITE_TILE_WIDTH, SPRITE_TILE_HEIGHT, IMAGE_VARIANT_QUALITY, chunk])
+        filename = f"sprite-{hashlib.sha256(key).hexdigest()[:20]}.webp"
+        sheet_index = len(layout["sheets"])
+        layout["sheets"].append({
+            "filename": filename,
+            "width": columns * SPRITE_TILE_WIDTH,
+            "height": math.ceil(len(chunk) / columns) * SPRITE_TILE_HEIGHT
+        })
+        for index, (card_id, _) in enumerate(chunk):
+            layout["cards"][card_id] = [sheet_index, (index % columns) * SPRITE_TILE_WIDTH, (index // columns) * SPRITE_TILE_HEIGHT]
+        path = output_dir / filename
+        if path.exists():
+            path.touch()  # still in use, so not pruned
+        else:
+            missing.append((chunk, columns, str(path)))
+    return layout, missing
+
+def prune_stale_files(directory: Path, max_age: float):
+    """Delete files in directory (other than its current.json) that nothing has touched for max_age seconds"""
+    cutoff = time.time() - max_age
+    for path in directory.iterdir():
+        try:
+            if path.name not in (BUNDLE_CURRENT, BUNDLE_LOCK) and path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass  # pruned by another worker
+
+def read_bundle_manifest() -> Dict[str, Dict[str, Any]]:
+    """Current bundle of every collection, as last recorded on disk by any worker"""
+    manifest = {}
+    for directory in bundles_dir.iterdir():
+        try:
+            mtime_ns = (directory / BUNDLE_CURRENT).stat().st_mtime_ns
+            cached = bundle_entries.get(directory.name)
+            if cached is None or cached[0] != mtime_ns:
+                cached = (mtime_ns, orjson.loads((directory / BUNDLE_CURRENT).read_bytes()))
+                bundle_entries[directory.name] = cached
+        except (FileNotFoundError, NotADirectoryError):
+            bundle_entries.pop(directory.name, None)
+            continue
+        manifest[directory.name] = cached[1]
+    return manifest
+
+def prepare_catalog_bundle(collection_id: str) -> Optional[Dict[str, Any]]:
+    """Bundle content and sprite plan for a collection, read from its pack pool; None removes its bundles"""
+    if Path(collection_id).name != collection_id or collection_id.startswith("."):
+        return None  # not usable as a directory name
+    collection_dir = bundles_dir / collection_id
+    pool = get_pack_pool(collection_id)
+    if pool is None:
+        shutil.rmtree(collection_dir, ignore_errors=True)
+        return None
+    
+    compact = build_collection_overview(pool)["compact"]
+    cards = sorted(pool.all_cards.cards, key=lambda card: (card.get("card_number", 0), card["id"]))
+    collection_dir.mkdir(exist_ok=True)
+    
+    # Sprite tiles come from the smallest variant there is; external images are left out
+    tiles = []
+    for card in cards:
+        variants = card.get("image_variants") or {}
+        source = (upload_path((variants.get("thumb") or {}).get("webp"))
+                  or upload_path((variants.get("medium") or {}).get("webp"))
+                  or upload_path(card.get("image_url")))
+        if source is not None:
+            tiles.append((card["id"], str(source)))
+    sprite, missing_sheets = plan_sprite_sheets(tiles, collection_dir) if tiles else (None, [])
+    if sprite is not None:
+        for sheet in sprite["sheets"]:
+            sheet["url"] = f"/bundles/{collection_id}/{sheet.pop('filename')}"
+    
+    bundle = {
+        "collection": compact["collection"],
+        "present": compact["present"],
+        "total_cards_in_set": compact["total_cards_in_set"],
+        "actual_cards_created": compact["actual_cards_created"],
+        "cards": cards,
+        "sprite": sprite
+    }
+    return {"directory": collection_dir, "bundle": bundle, "missing_sheets": missing_sheets, "catalog_version": pool.catalog_version}
+
+def write_catalog_bundle(collection_id: str, collection_dir: Path, bundle: Dict[str, Any], version: int) -> Dict[str, Any]:
+    """Write a collection's bundle files, record them as current unless a newer version is recorded, and prune stale files"""
+    body = orjson.dumps(bundle, option=orjson.OPT_SORT_KEYS)
+    filename = f"{hashlib.sha256(body).hexdigest()[:20]}.json"
+    
+    if not (collection_dir / filename).exists():
+        # Compressed siblings first, so the plain file's presence means the set is complete
+        for encoding in supported_encodings():
+            write_file_atomic(collection_dir / (filename + PRECOMPRESSED_SUFFIXES[encoding]), compress_body(body, encoding))
+        write_file_atomic(collection_dir / filename, body)
+    for encoding in supported_encodings():
+        (collection_dir / (filename + PRECOMPRESSED_SUFFIXES[encoding])).touch()
+    (collection_dir / filename).touch()
+    
+    entry = {"url": f"/bundles/{collection_id}/{filename}", "bytes": len(body), "sprite": bundle["sprite"], "catalog_version": version}
+    with open(collection_dir / BUNDLE_LOCK, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            current = orjson.loads((collection_dir / BUNDLE_CURRENT).read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            current = None
+        # A worker that read the catalog earlier must not replace a newer bundle
+        if current is not None and current.get("catalog_version", 0) > version:
+            entry = current
+        else:
+            write_file_atomic(collection_dir / BUNDLE_CURRENT, orjson.dumps(entry))
+    prune_stale_files(collection_dir, BUNDLE_RETENTION_SECONDS)
+    return entry
+
+async def build_catalog_bundle(collection_id: str) -> Optional[int]:
+    """Read the catalog on the Mongo pool, draw new sprite sheets in the image pool and write files on a plain thread.
+    
+    Returns the catalog version the bundle was built from.
+    """
+    prepared = await run_db(prepare_catalog_bundle, collection_id)
+    if prepared is None:
+        return None
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(get_image_executor(), draw_sprite_sheet, tiles, columns, path)
+        for tiles, columns, path in prepared["missing_sheets"]
+    ))
+    await run_in_threadpool(write_catalog_bundle, collection_id, prepared["directory"], prepared["bundle"], prepared["catalog_version"])
+    return prepared["catalog_version"]
+
+async def build_bundle_later(collection_id: str):
+    await asyncio.sleep(BUNDLE_BUILD_DELAY)
+    while True:
+        try:
+            version = await build_catalog_bundle(collection_id)
+            # Rebuild if the catalog changed while this bundle was being written
+            if version is None or await run_db(catalog_version, collection_id) == version:
+                break
+        except Exception as e:
+            print(f"Warning: could not build catalog bundle for {collection_id}: {e}")
+            break
+    bundle_builds.pop(collection_id, None)
+
+def schedule_bundle_build(collection_id: str):
+    """Rebuild a collection's bundle in the background; repeated calls coalesce"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # maintenance commands have no event loop and serve no bundles
+    if collection_id not in bundle_builds:
+        bundle_builds[collection_id] = asyncio.create_task(build_bundle_later(collection_id))
+
+app.mount("/bundles", CachedStaticFiles(directory=str(bundles_dir), immutable_names=re.compile(r"^(sprite-)?[0-9a-f]{20}\.(json|webp)$"), precompressed=True), name="bundles")
+
+def get_pack_odds(collection_id: str, packs: int, collectors: int, seed: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Simulated pack odds, cached per collection version"""
+    pool = get_pack_pool(collection_id)
+    if pool is None:
+        return None
+    key = (collection_id, pool.catalog_version, packs, collectors, seed)
+    with pack_odds_lock:
+        if key in pack_odds_cache:
+            pack_odds_cache.move_to_end(key)
+            return pack_odds_cache[key]
+    result = simulate_pack_odds(pool, packs, collectors, seed=seed)
+    result["catalog_version"] = key[1]
+    with pack_odds_lock:
+        pack_odds_cache[key] = result
+        pack_odds_cache.move_to_end(key)
+        while len(pack_odds_cache) > PACK_ODDS_CACHE_ENTRIES:
+            pack_odds_cache.popitem(last=False)
+    return result
 
 # Pydantic models
 class Card(BaseModel):
@@ -70,6 +1570,9 @@ class Card(BaseModel):
     description: Optional[str] = None
     image_url: str
     set_name: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None  # size -> format -> URL
+    source_image_url: Optional[str] = None  # Origin of a mirrored URL-based image
+    image_mirror: Optional[Dict[str, Any]] = None  # etag, last_modified, checked_at, error
 
 class CardCollection(BaseModel):
     id: str
@@ -83,14 +1586,582 @@ class PackOpenRequest(BaseModel):
     collection_id: str
     user_id: Optional[str] = "default_user"
 
+class PackBatchOpenRequest(BaseModel):
+    collection_id: str
+    user_id: Optional[str] = "default_user"
+    count: int = 10
+
 class UserCollection(BaseModel):
     user_id: str
-    collected_cards: List[Dict[str, Any]]
+    card_counts: Dict[str, int]  # Copies owned, keyed by card id
     total_packs_opened: int
-    created_at: str
+    created_at: datetime
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque keyset cursor: the sort key of the last item on a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    # Only plain values; an object such as {"$ne": null} would become a query operator
+    if (not isinstance(values, list) or len(values) != length
+            or any(isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))) for value in values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort: List[tuple], values: List[Any]) -> Dict[str, Any]:
+    """Match the documents that come after `values` in the given (field, direction) order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: value for (prev_field, _), value in zip(sort[:i], values)}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+# Keyset orders for card listings. Each is unique (collection_card_number_unique,
+# or ending in id) so cursors are exact, and each is the tail of an index used with
+# the equality filters, so pages are read in index order without a blocking sort.
+CARD_SORTS = {
+    "number": [("collection_id", ASCENDING), ("card_number", ASCENDING)],
+    "name": [("name", ASCENDING), ("id", ASCENDING)]
+}
+
+def find_cards_page(rarity: Optional[str], card_type: Optional[str], collection_id: Optional[str], name: Optional[str],
+                    sort: str, fields: Optional[str], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """One page of the card catalog, filtered, sorted and projected"""
+    order = [(field, -direction if sort.startswith("-") else direction) for field, direction in CARD_SORTS[sort.lstrip("-")]]
+    
+    query = {}
+    if rarity is not None:
+        query["rarity"] = rarity
+    if card_type is not None:
+        query["card_type"] = card_type
+    if collection_id is not None:
+        query["collection_id"] = collection_id
+    if name:
+        # Anchored and case-sensitive so the name index bounds the scan
+        query["name"] = {"$regex": f"^{re.escape(name)}"}
+    if cursor is not None:
+        query.update(keyset_filter(order, decode_cursor(cursor, len(order))))
+    
+    projection = {"_id": 0}
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(Card.__annotations__)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        # The sort keys are always returned; the next cursor is built from them
+        for field in requested | {field for field, _ in order}:
+            projection[field] = 1
+    
+    cards = list(cards_collection.find(query, projection).sort(order).limit(limit + 1))
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = encode_cursor([cards[-1].get(field) for field, _ in order])
+    return {"cards": cards, "next_cursor": next_cursor}
+
+# Indexes every collection needs, keyed by collection name. Unique indexes also
+# enforce the invariants the API relies on (one card per number in a collection,
+# one document per user).
+REQUIRED_INDEXES = {
+    cards_collection.name: [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("collection_id", ASCENDING), ("card_number", ASCENDING)], name="collection_card_number_unique", unique=True),
+        # Back the filtered, keyset-paginated /api/cards listing
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("rarity", ASCENDING), ("collection_id", ASCENDING), ("card_number", ASCENDING)], name="rarity_catalog_order"),
+        IndexModel([("card_type", ASCENDING), ("collection_id", ASCENDING), ("card_number", ASCENDING)], name="card_type_catalog_order")
+    ],
+    collections_db.name: [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True)
+    ],
+    user_collections_collection.name: [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True)
+    ],
+    image_blobs_collection.name: [
+        IndexModel([("sha256", ASCENDING)], name="sha256_unique", unique=True),
+        IndexModel([("filename", ASCENDING)], name="filename_unique", unique=True)
+    ],
+    jobs_collection.name: [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # At most one running delete per collection
+        IndexModel([("collection_id", ASCENDING)], name="active_collection_delete_unique", unique=True,
+                   partialFilterExpression={"active": True})
+    ],
+    catalog_versions_collection.name: [
+        IndexModel([("scope", ASCENDING)], name="scope_unique", unique=True)
+    ]
+}
+index_status: Dict[str, Any] = {}
+
+def ensure_indexes():
+    """Create the required indexes and record which of them are missing"""
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            try:
+                collection.create_indexes([index])
+            except OperationFailure as e:
+                # Usually existing duplicates blocking a unique index; the API keeps working
+                print(f"Warning: could not create index {index.document['name']} on {collection_name}: {e}")
+        record_index_status(collection_name)
+    if not card_numbers_unique():
+        print("Warning: card numbers are checked for duplicates per write until collection_card_number_unique is built")
+    ensure_pull_history()
+
+def record_index_status(collection_name: str):
+    present = set(db[collection_name].index_information())
+    index_status[collection_name] = {
+        "missing": [index.document["name"] for index in REQUIRED_INDEXES[collection_name] if index.document["name"] not in present]
+    }
+
+def card_numbers_unique() -> bool:
+    """Whether the unique (collection_id, card_number) index is in place to reject duplicate card numbers"""
+    if cards_collection.name not in index_status:
+        record_index_status(cards_collection.name)  # maintenance commands don't run ensure_indexes
+    return "collection_card_number_unique" not in index_status[cards_collection.name]["missing"]
+
+def card_number_taken(collection_id: str, card_number: Any) -> bool:
+    """Duplicate check for databases where the unique index could not be built (e.g. existing duplicates).
+    
+    This is racy, like the check before the index existed, and only runs while the index is missing.
+    """
+    if card_numbers_unique():
+        return False
+    return cards_collection.find_one({"collection_id": collection_id, "card_number": card_number}, {"_id": 1}) is not None
+
+def ensure_pull_history():
+    """Create the pull history collection (time-series when supported) and its indexes"""
+    ttl_seconds = int(float(PULL_HISTORY_TTL_DAYS) * 86400) if PULL_HISTORY_TTL_DAYS else None
+    is_time_series = False
+    exists = pack_pulls_collection.name in db.list_collection_names()
+    if not exists:
+        options = {"timeseries": {"timeField": "pulled_at", "metaField": "meta", "granularity": "seconds"}}
+        if ttl_seconds:
+            options["expireAfterSeconds"] = ttl_seconds
+        try:
+            db.create_collection(pack_pulls_collection.name, **options)
+            is_time_series = True
+        except CollectionInvalid:
+            exists = True  # Another worker created it first
+        except OperationFailure as e:
+            # MongoDB before 5.0: fall back to a regular collection
+            print(f"Warning: time-series pull history unavailable, using a regular collection: {e}")
+    if exists:
+        info = next(db.list_collections(filter={"name": pack_pulls_collection.name}), {})
+        is_time_series = info.get("type") == "timeseries"
+        if ttl_seconds and is_time_series:
+            # The TTL of an existing time-series collection is a collection option
+            try:
+                db.command("collMod", pack_pulls_collection.name, expireAfterSeconds=ttl_seconds)
+            except OperationFailure as e:
+                print(f"Warning: could not set the pull history TTL: {e}")
+    
+    pack_pulls_collection.create_index([("meta.user_id", 1), ("pulled_at", -1)])
+    pack_pulls_collection.create_index([("meta.collection_id", 1), ("pulled_at", -1)])
+    if ttl_seconds and not is_time_series:
+        pack_pulls_collection.create_index("pulled_at", expireAfterSeconds=ttl_seconds)
+
+def record_pack_pulls(user_id: str, collection_id: str, packs: List[List[Dict[str, Any]]]):
+    """Append one pull event per opened pack to the pull history"""
+    try:
+        pulled_at = datetime.now(timezone.utc)
+        pack_pulls_collection.insert_many([
+            {
+                "pulled_at": pulled_at,
+                "meta": {"user_id": user_id, "collection_id": collection_id},
+                "pack_id": str(uuid.uuid4()),
+                "card_ids": [card["id"] for card in cards]
+            }
+            for cards in packs
+        ], ordered=False)
+    except Exception as e:
+        print(f"Error recording pack pulls: {str(e)}")
+
+# Bulk card import. A manifest (NDJSON or CSV, one card per row) is read row by
+# row and written with unordered insert_many in batches, so a bad row costs an
+# error entry instead of the import. Images are URLs (mirrored in the background)
+# or names of files in an accompanying zip, stored through the blob store.
+# Catalog caches are invalidated once per collection at the end.
+IMPORT_BATCH_SIZE = 500
+CARD_TYPES = ["Pokemon", "Trainer", "Energy"]
+IMPORT_REQUIRED_FIELDS = ("name", "rarity", "card_type", "collection_id", "card_number")
+IMPORT_TEXT_FIELDS = ("attack_1", "attack_2", "weakness", "resistance", "description", "set_name")
+
+def iter_manifest_rows(stream, manifest_format: str):
+    """Yield one row per card from a binary NDJSON or CSV stream; a row that can't be read yields a ValueError"""
+    if manifest_format == "csv":
+        # Lines are decoded one at a time so bad bytes cost only the row they are in
+        bad_lines = []
+        def lines():
+            for line_number, line in enumerate(stream, start=1):
+                try:
+                    yield line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+                except UnicodeDecodeError:
+                    bad_lines.append(line_number)
+                    yield line.decode("utf-8", errors="replace")
+        reader = csv.DictReader(lines())
+        last_line = 0
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                row = ValueError(f"Unreadable CSV row: {e}")
+            if bad_lines and bad_lines[-1] > last_line:
+                row = ValueError("Row is not valid UTF-8")
+            last_line = reader.line_num
+            yield row
+    for line_number, line in enumerate(stream):
+        if line_number == 0 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        if not line.strip():
+            continue
+        try:
+            # orjson validates the UTF-8 as well
+            yield orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+def import_integer(value: Any, field: str) -> int:
+    """An integer manifest value: JSON integers, integral floats or CSV digits, but not booleans"""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{field} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+
+def validate_import_row(row: Any, collection_ids: set) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Card document for a manifest row, and the name of its image in the zip if it has one"""
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    # CSV gives every column as text, and empty cells as empty strings
+    row = {key.strip(): value.strip() if isinstance(value, str) else value for key, value in row.items() if key}
+    row = {key: value for key, value in row.items() if value not in ("", None)}
+    
+    missing = [field for field in IMPORT_REQUIRED_FIELDS if field not in row]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    if row["rarity"] not in RARITY_PROBABILITIES:
+        raise ValueError(f"Unknown rarity {row['rarity']!r}")
+    if row["card_type"] not in CARD_TYPES:
+        raise ValueError(f"Unknown card type {row['card_type']!r}")
+    if row["collection_id"] not in collection_ids:
+        raise ValueError(f"Collection {row['collection_id']} not found")
+    card_number = import_integer(row["card_number"], "card_number")
+    hp = import_integer(row["hp"], "hp") if "hp" in row else None
+    if card_number < 1:
+        raise ValueError("card_number must be at least 1")
+    if ("image_url" in row) == ("image" in row):
+        raise ValueError("Give exactly one of image_url or image")
+    
+    image_url = row.get("image_url")
+    card = {
+        "id": str(uuid.uuid4()),
+        "name": str(row["name"]),
+        "rarity": row["rarity"],
+        "card_type": row["card_type"],
+        "collection_id": row["collection_id"],
+        "card_number": card_number,
+        "hp": hp,
+        **{field: str(row[field]) if field in row else None for field in IMPORT_TEXT_FIELDS},
+        "image_url": image_url,
+        "source_image_url": image_url if is_remote_url(image_url) else None
+    }
+    return card, row.get("image")
+
+def store_zip_image(archive: zipfile.ZipFile, name: str) -> str:
+    """Store an image from the import zip in the blob store; returns its URL"""
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise ValueError(f"Image {name} is not in the zip")
+    sink = ImageSink()
+    try:
+        with archive.open(info) as member:
+            while True:
+                chunk = member.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                sink.write(chunk)
+        tmp_path, extension, sha256 = sink.finish()
+    except HTTPException as e:
+        sink.discard()
+        raise ValueError(f"Image {name}: {e.detail}")
+    except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError) as e:
+        # Corrupt, truncated, encrypted or unsupported-compression members
+        sink.discard()
+        raise ValueError(f"Image {name} could not be read from the zip: {e}")
+    except BaseException:
+        sink.discard()
+        raise
+    try:
+        return acquire_image_blob(tmp_path, extension, sha256)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def import_cards(rows, archive: Optional[zipfile.ZipFile] = None, inserted: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Validate and insert manifest rows in batches; returns the inserted cards and per-row errors (rows count from 1).
+    
+    Inserted cards are appended to `inserted` as they are stored, so a caller can
+    finish them even when the import stops on an unexpected error.
+    """
+    collection_ids = set(collections_db.distinct("id"))
+    inserted = [] if inserted is None else inserted
+    errors = []
+    batch = []  # (row number, card)
+    numbers = set()  # (collection id, card number) of rows taken so far
+    
+    def flush():
+        try:
+            cards_collection.insert_many([card for _, card in batch], ordered=False)
+            failed = {}
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        for index, (row_number, card) in enumerate(batch):
+            card.pop("_id", None)
+            if index not in failed:
+                inserted.append(card)
+                continue
+            if failed[index].get("code") == 11000:
+                error = f"Card number {card['card_number']} already exists in collection {card['collection_id']}"
+            else:
+                error = failed[index].get("errmsg", "Insert failed")
+            errors.append({"row": row_number, "error": error})
+            release_image(card["image_url"])
+        batch.clear()
+    
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                card, image_name = validate_import_row(row, collection_ids)
+                number = (card["collection_id"], card["card_number"])
+                if number in numbers or card_number_taken(*number):
+                    raise ValueError(f"Card number {card['card_number']} already exists in collection {card['collection_id']}")
+                if image_name is not None:
+                    if archive is None:
+                        raise ValueError("Row names an image but no image zip was given")
+                    card["image_url"] = store_zip_image(archive, image_name)
+                elif upload_path(card["image_url"]) is not None:
+                    # Another card's upload: the card needs its own reference
+                    acquire_image_reference(card["image_url"])
+            except ValueError as e:
+                errors.append({"row": row_number, "error": str(e)})
+                continue
+            batch.append((row_number, card))
+            numbers.add(number)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    finally:
+        # Only left over when the import stopped before storing this batch
+        for _, card in batch:
+            release_image(card["image_url"])
+    return {"inserted": inserted, "errors": errors}
+
+async def finish_import(cards: List[Dict[str, Any]]):
+    """Invalidate each touched collection once and start image processing for imported cards"""
+    for collection_id in {card["collection_id"] for card in cards}:
+        await catalog_collection_changed(collection_id)
+    for card in cards:
+        if card["source_image_url"]:
+            schedule_image_mirror(card["id"])
+        else:
+            schedule_card_variants(card)
+
+def manifest_format_for(filename: Optional[str], manifest_format: Optional[str]) -> str:
+    manifest_format = manifest_format or ("csv" if (filename or "").lower().endswith(".csv") else "ndjson")
+    if manifest_format not in ("csv", "ndjson"):
+        raise ValueError("format must be 'csv' or 'ndjson'")
+    return manifest_format
+
+# Background jobs. A cascading collection delete runs as a job document in
+# db.jobs that records its status and progress; the request that starts it
+# returns straight away and clients poll /api/jobs/{job_id}. Every step can be
+# repeated, so a job whose worker stopped heartbeating (process restart, crash)
+# is claimed and finished by whichever worker notices it first.
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', '500'))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '60'))
+JOB_PROJECTION = {"_id": 0, "active": 0, "owners": 0}
+
+def update_job(job_id: str, fields: Dict[str, Any], finished: bool = False):
+    """Record job fields; doubles as the heartbeat. A finished job releases its collection lock"""
+    now = datetime.now(timezone.utc)
+    update = {"$set": {**fields, "updated_at": now}}
+    if finished:
+        update["$set"]["finished_at"] = now
+        update["$unset"] = {"active": ""}
+    jobs_collection.update_one({"id": job_id}, update)
+
+def claim_stale_job(query: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Take over an unfinished job nobody has touched for JOB_STALE_SECONDS"""
+    now = datetime.now(timezone.utc)
+    return jobs_collection.find_one_and_update(
+        {**(query or {}), "active": True, "updated_at": {"$lt": now - timedelta(seconds=JOB_STALE_SECONDS)}},
+        {"$set": {"updated_at": now}},
+        projection={"_id": 0, "active": 0}
+    )
+
+def start_collection_delete(collection_id: str) -> Tuple[Dict[str, Any], bool]:
+    """Create the delete job for a collection, or return the one already active; the flag says whether it needs running"""
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": "delete_collection",
+        "collection_id": collection_id,
+        "status": "queued",
+        "active": True,
+        "progress": {
+            "cards_total": cards_collection.count_documents({"collection_id": collection_id}),
+            "cards_deleted": 0,
+            "images_released": 0,
+            "users_updated": 0
+        },
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None
+    }
+    try:
+        jobs_collection.insert_one(job)
+    except DuplicateKeyError:
+        claimed = claim_stale_job({"collection_id": collection_id})
+        if claimed is not None:
+            return claimed, True
+        return jobs_collection.find_one({"collection_id": collection_id, "active": True}, JOB_PROJECTION), False
+    job.pop("_id", None)
+    job.pop("active")
+    return job, True
+
+def find_collection_owners(collection_id: str) -> List[str]:
+    """Users owning any card of a collection, by their card counts and by their stats (which may have drifted)"""
+    card_ids = cards_collection.distinct("id", {"collection_id": collection_id})
+    owners = set(user_collections_collection.distinct(
+        "user_id", {f"stats.collection_stats.{collection_id}": {"$exists": True}}
+    ))
+    if card_ids:
+        owners.update(user["user_id"] for user in user_collections_collection.aggregate([
+            {"$project": {"user_id": 1, "owned": {"$map": {
+                "input": {"$objectToArray": {"$ifNull": ["$card_counts", {}]}}, "in": "$$this.k"
+            }}}},
+            {"$match": {"owned": {"$in": card_ids}}},
+            {"$project": {"_id": 0, "user_id": 1}}
+        ]))
+    return sorted(owners)
+
+def delete_card_batch(collection_id: str, owners: List[str]) -> Optional[Dict[str, int]]:
+    """Delete up to JOB_BATCH_SIZE cards of a collection with their image references and the owners' counts"""
+    card_ids = [card["id"] for card in cards_collection.find({"collection_id": collection_id}, {"_id": 0, "id": 1}).limit(JOB_BATCH_SIZE)]
+    if not card_ids:
+        return None
+    # Marked cards are left to the job (single-card deletes and image changes skip
+    # them), so the image read here is the one this delete has to release
+    cards_collection.update_many({"id": {"$in": card_ids}}, {"$set": {"deleting": True}})
+    cards = list(cards_collection.find({"id": {"$in": card_ids}, "deleting": True}, {"_id": 0, "id": 1, "image_url": 1}))
+    card_ids = [card["id"] for card in cards]
+    deleted = cards_collection.delete_many({"id": {"$in": card_ids}, "deleting": True}).deleted_count
+
+    released = 0
+    image_counts = {}
+    for card in cards:
+        if upload_path(card.get("image_url")) is not None:
+            image_counts[card["image_url"]] = image_counts.get(card["image_url"], 0) + 1
+    for image_url, count in image_counts.items():
+        try:
+            release_image(image_url, count)
+            released += count
+        except Exception as e:
+            print(f"Warning: could not release image {image_url}: {e}")
+
+    if owners and card_ids:
+        user_collections_collection.update_many(
+            {"user_id": {"$in": owners}}, {"$unset": {f"card_counts.{card_id}": "" for card_id in card_ids}}
+        )
+    return {"cards": deleted, "images": released}
+
+async def run_collection_delete(job: Dict[str, Any]):
+    """Delete a collection, then its cards in batches, then refresh the stats of users who owned them"""
+    job_id, collection_id, progress = job["id"], job["collection_id"], job["progress"]
+    try:
+        await run_db(update_job, job_id, {"status": "running"})
+        # The collection goes first, so it drops out of listings and pack opening at once
+        await run_db(collections_db.delete_one, {"id": collection_id})
+        await catalog_collection_changed(collection_id)
+
+        # Owners are found once, while the cards still exist, and kept for a resumed job
+        owners = job.get("owners")
+        if owners is None:
+            owners = await run_db(find_collection_owners, collection_id)
+            await run_db(update_job, job_id, {"owners": owners})
+
+        while True:
+            batch = await run_db(delete_card_batch, collection_id, owners)
+            if batch is None:
+                break
+            progress["cards_deleted"] += batch["cards"]
+            progress["images_released"] += batch["images"]
+            await run_db(update_job, job_id, {"progress": progress})
+        await catalog_collection_changed(collection_id)
+
+        for index, user_id in enumerate(owners, start=1):
+            await run_db(recompute_user_stats, user_id)
+            progress["users_updated"] = index
+            if index % JOB_BATCH_SIZE == 0:
+                await run_db(update_job, job_id, {"progress": progress})
+
+        await run_db(update_job, job_id, {"status": "completed", "progress": progress}, finished=True)
+    except asyncio.CancelledError:
+        raise  # left active, so another worker resumes it
+    except Exception as e:
+        print(f"Error deleting collection {collection_id}: {e}")
+        await run_db(update_job, job_id, {"status": "failed", "progress": progress, "error": str(e)}, finished=True)
+
+def schedule_job(job: Dict[str, Any]):
+    task = asyncio.create_task(run_collection_delete(job))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def resume_stale_jobs_forever():
+    """Pick up jobs abandoned by a stopped worker"""
+    while True:
+        try:
+            while (job := await run_db(claim_stale_job)) is not None:
+                print(f"Resuming job {job['id']} ({job['type']} {job['collection_id']})")
+                schedule_job(job)
+        except Exception as e:
+            print(f"Warning: could not resume background jobs: {e}")
+        await asyncio.sleep(JOB_STALE_SECONDS)
 
 # API Routes
 
+@app.on_event("startup")
+async def startup():
+    await run_db(ensure_indexes)
+    await run_in_threadpool(sweep_upload_temp_files)
+    mirror_task = asyncio.create_task(revalidate_image_mirrors_forever())
+    background_tasks.add(mirror_task)
+    jobs_task = asyncio.create_task(resume_stale_jobs_forever())
+    background_tasks.add(jobs_task)
+    # Write (or re-adopt) bundles for every collection
+    for collection in await run_db(lambda: list(collections_db.find({}, {"_id": 0, "id": 1}))):
+        schedule_bundle_build(collection["id"])
+
+@app.on_event("shutdown")
+async def shutdown():
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
+    for task in background_tasks:
+        task.cancel()
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "message": "TCG Pocket API is running"}
@@ -99,46 +2170,79 @@ async def health_check():
 async def create_collection(collection: CardCollection):
     try:
         collection_data = collection.dict()
-        result = collections_db.insert_one(collection_data)
+        if not is_stats_key(collection_data["id"]):
+            raise HTTPException(status_code=400, detail="Collection id can't be empty, contain '.' or start with '$'")
+        try:
+            await run_db(collections_db.insert_one, collection_data)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail=f"Collection {collection_data['id']} already exists")
         
         # Remove the MongoDB _id field from response to avoid serialization issues
         collection_data.pop('_id', None)
+        await catalog_collection_changed(collection_data["id"])
         
         return {"message": "Collection created successfully", "collection": collection_data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating collection: {str(e)}")
 
 @app.get("/api/collections")
-async def get_collections():
-    try:
-        collections = list(collections_db.find({}, {"_id": 0}))
+async def get_collections(request: Request):
+    async def build():
+        collections = await run_db(lambda: list(collections_db.find({}, {"_id": 0})))
         
-        # Add actual card counts to each collection
+        # Add actual card counts to each collection, counted in one aggregation
+        card_counts = await run_db(lambda: {
+            group["_id"]: group["count"]
+            for group in cards_collection.aggregate([{"$group": {"_id": "$collection_id", "count": {"$sum": 1}}}])
+        })
         for collection in collections:
-            card_count = cards_collection.count_documents({"collection_id": collection["id"]})
-            collection["actual_cards"] = card_count
+            collection["actual_cards"] = card_counts.get(collection["id"], 0)
         
         return {"collections": collections}
+    
+    try:
+        return await catalog_response(request, ("collections",), CATALOG_SCOPE, build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching collections: {str(e)}")
 
 @app.delete("/api/collections/{collection_id}")
-async def delete_collection(collection_id: str):
+async def delete_collection(collection_id: str, request: Request, cascade: bool = False):
     try:
         # Check if collection exists
-        collection = collections_db.find_one({"id": collection_id})
+        collection = await run_db(collections_db.find_one, {"id": collection_id})
+        card_count = await run_db(cards_collection.count_documents, {"collection_id": collection_id})
+        
+        if cascade:
+            # Cards, images and owned counts are removed by a background job (also
+            # finishing a delete that left cards behind the collection)
+            if collection or card_count > 0:
+                job, start = await run_db(start_collection_delete, collection_id)
+            else:
+                job, start = await run_db(jobs_collection.find_one, {"collection_id": collection_id, "active": True}, JOB_PROJECTION), False
+            if job is None:
+                raise HTTPException(status_code=404, detail="Collection not found")
+            if start:
+                schedule_job(job)
+            return await json_response(request, {
+                "message": "Collection deletion started",
+                "job": job,
+                "status_url": f"/api/jobs/{job['id']}"
+            }, status_code=202)
+        
         if not collection:
             raise HTTPException(status_code=404, detail="Collection not found")
         
         # Check if there are cards in this collection
-        card_count = cards_collection.count_documents({"collection_id": collection_id})
         if card_count > 0:
-            raise HTTPException(status_code=400, detail=f"Cannot delete collection with {card_count} cards. Delete cards first.")
+            raise HTTPException(status_code=400, detail=f"Cannot delete collection with {card_count} cards. Delete cards first, or pass cascade=true.")
         
         # Delete the collection
-        result = collections_db.delete_one({"id": collection_id})
+        result = await run_db(collections_db.delete_one, {"id": collection_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Collection not found")
+        await catalog_collection_changed(collection_id)
         
         return {"message": "Collection deleted successfully"}
     except HTTPException:
@@ -146,6 +2250,18 @@ async def delete_collection(collection_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting collection: {str(e)}")
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        job = await run_db(jobs_collection.find_one, {"id": job_id}, JOB_PROJECTION)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching job: {str(e)}")
+
 @app.post("/api/cards-from-url")
 async def create_card_from_url(card_data: dict):
     try:
@@ -166,23 +2282,28 @@ async def create_card_from_url(card_data: dict):
             "weakness": card_data.get("weakness"),
             "resistance": card_data.get("resistance"),
             "description": card_data.get("description"),
-            "image_url": card_data["image_url"],  # Use the provided URL directly
+            "image_url": card_data["image_url"],  # Served directly until the local mirror is ready
+            "source_image_url": card_data["image_url"] if is_remote_url(card_data["image_url"]) else None,
             "set_name": card_data.get("set_name")
         }
         
-        # Check if card number already exists in this collection
-        existing_card = cards_collection.find_one({
-            "collection_id": card_data["collection_id"], 
-            "card_number": card_data["card_number"]
-        })
-        if existing_card:
-            raise HTTPException(status_code=400, detail=f"Card number {card_data['card_number']} already exists in this collection")
+        if not is_stats_key(card_document["rarity"]) or not is_stats_key(card_document["collection_id"]):
+            raise HTTPException(status_code=400, detail="Rarity and collection id can't be empty, contain '.' or start with '$'")
         
-        # Insert into MongoDB
-        result = cards_collection.insert_one(card_document)
+        # Insert into MongoDB; the unique (collection_id, card_number) index rejects
+        # duplicates, or the check here while that index is missing
+        if await run_db(card_number_taken, card_document["collection_id"], card_document["card_number"]):
+            raise HTTPException(status_code=400, detail=f"Card number {card_data['card_number']} already exists in this collection")
+        try:
+            await run_db(cards_collection.insert_one, card_document)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail=f"Card number {card_data['card_number']} already exists in this collection")
         
         # Remove the MongoDB _id field from response to avoid serialization issues
         card_document.pop('_id', None)
+        await catalog_card_saved(card_document)
+        if card_document["source_image_url"]:
+            schedule_image_mirror(card_id)
         
         return {"message": "Card created successfully from URL", "card": card_document}
     
@@ -208,26 +2329,19 @@ async def create_card(
     image: UploadFile = File(...)
 ):
     try:
-        # Check if card number already exists in this collection
-        existing_card = cards_collection.find_one({
-            "collection_id": collection_id, 
-            "card_number": card_number
-        })
-        if existing_card:
+        if not is_stats_key(rarity) or not is_stats_key(collection_id):
+            raise HTTPException(status_code=400, detail="Rarity and collection id can't be empty, contain '.' or start with '$'")
+        if await run_db(card_number_taken, collection_id, card_number):
             raise HTTPException(status_code=400, detail=f"Card number {card_number} already exists in this collection")
         
-        # Generate unique ID and save image
+        # Generate unique ID, stream the image to a temp file and store it by content,
+        # shared with any card that already uses the same image
         card_id = str(uuid.uuid4())
-        
-        # Save uploaded image
-        file_extension = image.filename.split('.')[-1] if '.' in image.filename else 'jpg'
-        image_filename = f"{card_id}.{file_extension}"
-        image_path = uploads_dir / image_filename
-        
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        
-        image_url = f"/uploads/{image_filename}"
+        tmp_path, file_extension, sha256 = await stream_upload(image)
+        try:
+            image_url = await run_db(acquire_image_blob, tmp_path, file_extension, sha256)
+        finally:
+            tmp_path.unlink(missing_ok=True)
         
         # Create card document
         card_data = {
@@ -247,11 +2361,20 @@ async def create_card(
             "set_name": set_name
         }
         
-        # Insert into MongoDB
-        result = cards_collection.insert_one(card_data)
+        # Insert into MongoDB; the unique (collection_id, card_number) index rejects duplicates.
+        # A failed insert gives its image reference back, removing the file if it was new.
+        try:
+            await run_db(cards_collection.insert_one, card_data)
+        except BaseException as e:
+            await run_db(release_image, image_url)
+            if isinstance(e, DuplicateKeyError):
+                raise HTTPException(status_code=400, detail=f"Card number {card_number} already exists in this collection")
+            raise
+        schedule_card_variants(card_data)
         
         # Remove the MongoDB _id field from response to avoid serialization issues
         card_data.pop('_id', None)
+        await catalog_card_saved(card_data)
         
         return {"message": "Card created successfully", "card": card_data}
     
@@ -260,62 +2383,134 @@ async def create_card(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating card: {str(e)}")
 
+@app.post("/api/cards/import")
+async def import_cards_endpoint(
+    manifest: UploadFile = File(...),
+    images: Optional[UploadFile] = File(None),
+    format: Optional[str] = Form(None)
+):
+    try:
+        try:
+            manifest_format = manifest_format_for(manifest.filename, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        archive = None
+        if images is not None:
+            try:
+                archive = await run_db(zipfile.ZipFile, images.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail="images must be a zip file")
+        
+        inserted = []
+        try:
+            result = await run_db(import_cards, iter_manifest_rows(manifest.file, manifest_format), archive, inserted)
+        finally:
+            # Cards stored before an unexpected error still need their caches and images
+            await finish_import(inserted)
+            if archive is not None:
+                archive.close()
+        
+        return {
+            "message": f"Imported {len(result['inserted'])} cards",
+            "inserted": len(result["inserted"]),
+            "failed": len(result["errors"]),
+            "errors": result["errors"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing cards: {str(e)}")
+
 @app.get("/api/cards")
-async def get_cards():
+async def get_cards(
+    request: Request,
+    rarity: Optional[str] = None,
+    card_type: Optional[str] = None,
+    collection_id: Optional[str] = None,
+    name: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """All cards, or one filtered page of them when any query parameter is given"""
+    params = (rarity, card_type, collection_id, name, sort, fields, limit, cursor)
+    
+    async def build():
+        if all(param is None for param in params):
+            cards = await run_db(lambda: list(cards_collection.find({}, {"_id": 0})))
+            return {"cards": cards}
+        return await run_db(
+            find_cards_page, rarity, card_type, collection_id, name, sort or "number", fields, limit or 100, cursor
+        )
+    
     try:
-        cards = list(cards_collection.find({}, {"_id": 0}))
-        return {"cards": cards}
+        if limit is not None and (limit < 1 or limit > MAX_PAGE_SIZE):
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        if sort is not None and sort.lstrip("-") not in CARD_SORTS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(CARD_SORTS)} (prefix with - to reverse)")
+        
+        # Pages within one collection are invalidated with that collection only
+        scope = collection_id if collection_id is not None else CATALOG_SCOPE
+        return await catalog_response(request, ("cards", "query") + params, scope, build)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching cards: {str(e)}")
 
 @app.get("/api/cards/collection/{collection_id}")
-async def get_cards_by_collection(collection_id: str):
-    try:
-        cards = list(cards_collection.find({"collection_id": collection_id}, {"_id": 0}))
+async def get_cards_by_collection(request: Request, collection_id: str):
+    async def build():
+        cards = await run_db(lambda: list(cards_collection.find({"collection_id": collection_id}, {"_id": 0})))
         return {"cards": cards}
+    
+    try:
+        return await catalog_response(request, ("cards", collection_id), collection_id, build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching cards by collection: {str(e)}")
 
-@app.get("/api/collection-overview/{collection_id}")
-async def get_collection_overview(collection_id: str):
+@app.get("/api/catalog-bundles")
+async def get_catalog_bundles(request: Request):
+    """Current static bundle of each collection; the bundle files themselves never change"""
     try:
-        # Get collection details
-        collection = collections_db.find_one({"id": collection_id}, {"_id": 0})
-        if not collection:
+        bundles = await run_in_threadpool(read_bundle_manifest)
+        # Bundles behind the shared catalog version (written before another worker's
+        # or a maintenance command's change) are served until this worker rebuilds them
+        versions = await run_db(catalog_versions_of, list(bundles))
+        for collection_id, entry in bundles.items():
+            if entry.get("catalog_version", 0) < versions.get(collection_id, 0):
+                schedule_bundle_build(collection_id)
+        return await json_response(request, {"bundles": bundles})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching catalog bundles: {str(e)}")
+
+@app.get("/api/collection-sprite/{collection_id}")
+async def get_collection_sprite(request: Request, collection_id: str):
+    """Sprite sheet URL and tile offsets for a collection's card thumbnails"""
+    try:
+        sprite = ((await run_in_threadpool(read_bundle_manifest)).get(collection_id) or {}).get("sprite")
+        if sprite is None:
+            raise HTTPException(status_code=404, detail="No sprite sheet for this collection yet")
+        return await json_response(request, sprite)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching collection sprite: {str(e)}")
+
+@app.get("/api/collection-overview/{collection_id}")
+async def get_collection_overview(request: Request, collection_id: str, format: str = "full"):
+    async def build():
+        pool = await run_db(get_pack_pool, collection_id)
+        if pool is None:
             raise HTTPException(status_code=404, detail="Collection not found")
+        return build_collection_overview(pool)[format]
+    
+    try:
+        if format not in ("full", "compact"):
+            raise HTTPException(status_code=400, detail="format must be 'full' or 'compact'")
         
-        # Get all cards in this collection
-        cards = list(cards_collection.find({"collection_id": collection_id}, {"_id": 0}))
-        
-        # Sort cards by card number
-        cards.sort(key=lambda x: x.get("card_number", 0))
-        
-        # Create complete overview with missing cards
-        total_cards_in_set = collection.get("total_cards_in_set", 50)
-        complete_set = []
-        
-        for i in range(1, total_cards_in_set + 1):
-            # Find card with this number
-            found_card = next((card for card in cards if card.get("card_number") == i), None)
-            if found_card:
-                complete_set.append({
-                    "card_number": i,
-                    "exists": True,
-                    "card": found_card
-                })
-            else:
-                complete_set.append({
-                    "card_number": i,
-                    "exists": False,
-                    "card": None
-                })
-        
-        return {
-            "collection": collection,
-            "complete_set": complete_set,
-            "total_cards_in_set": total_cards_in_set,
-            "actual_cards_created": len(cards)
-        }
+        return await catalog_response(request, ("collection-overview", collection_id, format), collection_id, build)
     except HTTPException:
         raise
     except Exception as e:
@@ -324,14 +2519,49 @@ async def get_collection_overview(collection_id: str):
 @app.patch("/api/cards/{card_id}/image")
 async def update_card_image(card_id: str, image_data: dict):
     try:
+        current = await run_db(cards_collection.find_one, {"id": card_id}, {"_id": 0, "image_url": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Card not found")
+        
+        # A local URL shares another card's blob, so it needs a reference of its own
+        acquired = False
+        if current.get("image_url") != image_data["image_url"] and upload_path(image_data["image_url"]) is not None:
+            try:
+                await run_db(acquire_image_reference, image_data["image_url"])
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            acquired = True
+        
         # Update the card's image URL
-        result = cards_collection.update_one(
-            {"id": card_id},
-            {"$set": {"image_url": image_data["image_url"]}}
+        card = await run_db(
+            cards_collection.find_one_and_update,
+            {"id": card_id, "deleting": {"$ne": True}},
+            {"$set": {
+                "image_url": image_data["image_url"],
+                "image_variants": None,
+                "source_image_url": image_data["image_url"] if is_remote_url(image_data["image_url"]) else None,
+                "image_mirror": None
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if card is None:
+            if acquired:
+                await run_db(release_image, image_data["image_url"])
             raise HTTPException(status_code=404, detail="Card not found")
+        if card.get("image_url") != image_data["image_url"]:
+            await run_db(release_image, card.get("image_url"))
+        elif acquired:
+            # Another request set the same URL in the meantime and holds its own reference
+            await run_db(release_image, image_data["image_url"])
+        card.update(image_url=image_data["image_url"], image_variants=None, image_mirror=None,
+                    source_image_url=image_data["image_url"] if is_remote_url(image_data["image_url"]) else None)
+        await catalog_card_saved(card)
+        if card["source_image_url"]:
+            schedule_image_mirror(card_id)
+        else:
+            schedule_card_variants(card)
         
         return {"message": "Card image updated successfully"}
     except HTTPException:
@@ -343,22 +2573,19 @@ async def update_card_image(card_id: str, image_data: dict):
 async def delete_card(card_id: str):
     try:
         # Find the card first to get the image path
-        card = cards_collection.find_one({"id": card_id}, {"_id": 0})
+        card = await run_db(cards_collection.find_one, {"id": card_id}, {"_id": 0})
         if not card:
             raise HTTPException(status_code=404, detail="Card not found")
         
-        # Delete the card from database
-        result = cards_collection.delete_one({"id": card_id})
+        # Delete the card from database (cards marked by a collection delete are left to it)
+        result = await run_db(cards_collection.delete_one, {"id": card_id, "deleting": {"$ne": True}})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Card not found")
+        await catalog_card_removed(card)
         
-        # Try to delete the image file (optional, don't fail if file doesn't exist)
+        # Release the image; the file goes once no other card uses it (don't fail the delete over it)
         try:
-            if card.get("image_url"):
-                image_filename = card["image_url"].replace("/uploads/", "")
-                image_path = uploads_dir / image_filename
-                if image_path.exists():
-                    image_path.unlink()
+            await run_db(release_image, card.get("image_url"))
         except Exception as img_error:
             print(f"Warning: Could not delete image file: {img_error}")
         
@@ -371,108 +2598,20 @@ async def delete_card(card_id: str):
 @app.post("/api/open-pack")
 async def open_pack(request: PackOpenRequest):
     try:
-        # Get collection details
-        collection = collections_db.find_one({"id": request.collection_id}, {"_id": 0})
-        if not collection:
+        # Get the collection's resident pack pool (only queries Mongo on first use)
+        pool = await run_db(get_pack_pool, request.collection_id)
+        if pool is None:
             raise HTTPException(status_code=404, detail="Collection not found")
+        collection = pool.collection
         
-        # Get all cards from this collection
-        available_cards = list(cards_collection.find(
-            {"collection_id": request.collection_id}, 
-            {"_id": 0}
-        ))
-        
-        if not available_cards:
+        if not pool.all_cards:
             raise HTTPException(status_code=400, detail="No cards available in this collection")
         
-        # Group cards by type for guaranteed selections
-        pokemon_cards = [card for card in available_cards if card["card_type"] == "Pokemon"]
-        trainer_cards = [card for card in available_cards if card["card_type"] == "Trainer"]
-        energy_cards = [card for card in available_cards if card["card_type"] == "Energy"]
-        
-        pulled_cards = []
-        card_counts = {}  # Track how many times each card has been selected
-        
-        # Helper function to add card with duplicate limit
-        def add_card_with_limit(card, max_copies=2):
-            card_id = card["id"]
-            current_count = card_counts.get(card_id, 0)
-            if current_count < max_copies:
-                pulled_cards.append(card)
-                card_counts[card_id] = current_count + 1
-                return True
-            return False
-        
-        # Helper function to select random card from list with duplicate checking
-        def select_random_card_with_limit(card_list, max_attempts=50):
-            attempts = 0
-            while attempts < max_attempts and card_list:
-                selected_card = random.choice(card_list)
-                if add_card_with_limit(selected_card):
-                    return True
-                attempts += 1
-            return False
-        
-        # Guarantee 1 Energy card
-        if energy_cards:
-            select_random_card_with_limit(energy_cards)
-        elif available_cards:  # Fallback if no energy cards
-            select_random_card_with_limit(available_cards)
-        
-        # Guarantee 1 Trainer card
-        if trainer_cards:
-            select_random_card_with_limit(trainer_cards)
-        elif available_cards:  # Fallback if no trainer cards
-            select_random_card_with_limit(available_cards)
-        
-        # Fill remaining 4 slots with random cards based on rarity probabilities
-        remaining_slots = CARDS_PER_PACK - len(pulled_cards)
-        
-        # Group all cards by rarity for probability-based selection
-        cards_by_rarity = {}
-        for card in available_cards:
-            rarity = card["rarity"]
-            if rarity not in cards_by_rarity:
-                cards_by_rarity[rarity] = []
-            cards_by_rarity[rarity].append(card)
-        
-        for _ in range(remaining_slots):
-            # Generate random number to determine rarity based on probabilities
-            attempts = 0
-            max_rarity_attempts = 20  # Try different rarities if duplicates are at limit
-            
-            while attempts < max_rarity_attempts:
-                rand = random.random()
-                cumulative_prob = 0
-                selected_rarity = "Common"  # default fallback
-                
-                for rarity, prob in RARITY_PROBABILITIES.items():
-                    cumulative_prob += prob
-                    if rand <= cumulative_prob:
-                        selected_rarity = rarity
-                        break
-                
-                # Try to select a card of the chosen rarity with duplicate limit
-                if selected_rarity in cards_by_rarity and cards_by_rarity[selected_rarity]:
-                    if select_random_card_with_limit(cards_by_rarity[selected_rarity]):
-                        break  # Successfully added a card
-                
-                # If we couldn't add a card of this rarity (due to duplicate limits), try again
-                attempts += 1
-            
-            # If we exhausted rarity attempts, try to add any available card
-            if attempts >= max_rarity_attempts:
-                # Find cards that are still under the limit
-                available_for_selection = [
-                    card for card in available_cards 
-                    if card_counts.get(card["id"], 0) < 2
-                ]
-                if available_for_selection:
-                    selected_card = random.choice(available_for_selection)
-                    add_card_with_limit(selected_card)
+        pulled_cards, card_counts = pool.roll_pack()
         
         # Add cards to user's collection
         await add_cards_to_collection(request.user_id, pulled_cards)
+        await run_db(record_pack_pulls, request.user_id, request.collection_id, [pulled_cards])
         
         return {
             "message": "Pack opened successfully!",
@@ -489,46 +2628,181 @@ async def open_pack(request: PackOpenRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error opening pack: {str(e)}")
 
-async def add_cards_to_collection(user_id: str, cards: List[Dict[str, Any]]):
-    """Add opened cards to user's collection"""
+@app.post("/api/open-packs")
+async def open_packs(request: PackBatchOpenRequest):
     try:
-        # Get or create user collection
-        user_collection = user_collections_collection.find_one({"user_id": user_id})
+        if request.count < 1 or request.count > MAX_PACKS_PER_REQUEST:
+            raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_PACKS_PER_REQUEST}")
         
-        if not user_collection:
-            # Create new collection
-            user_collection = {
-                "user_id": user_id,
-                "collected_cards": [],
-                "total_packs_opened": 0,
-                "created_at": str(uuid.uuid4())
-            }
+        pool = await run_db(get_pack_pool, request.collection_id)
+        if pool is None:
+            raise HTTPException(status_code=404, detail="Collection not found")
         
-        # Add timestamp to each card when collected
-        timestamped_cards = []
-        for card in cards:
-            card_copy = card.copy()
-            card_copy["collected_at"] = str(uuid.uuid4())  # Using uuid as timestamp placeholder
-            timestamped_cards.append(card_copy)
-        
-        # Update collection
-        user_collection["collected_cards"].extend(timestamped_cards)
-        user_collection["total_packs_opened"] = user_collection.get("total_packs_opened", 0) + 1
-        
-        # Upsert to database
-        user_collections_collection.update_one(
-            {"user_id": user_id},
-            {"$set": user_collection},
-            upsert=True
-        )
+        if not pool.all_cards:
+            raise HTTPException(status_code=400, detail="No cards available in this collection")
+        
+        # Roll every pack from the pool first, then persist them in a single write
+        packs = []
+        pulled_packs = []
+        all_pulled_cards = []
+        for _ in range(request.count):
+            pulled_cards, card_counts = pool.roll_pack()
+            pulled_packs.append(pulled_cards)
+            all_pulled_cards.extend(pulled_cards)
+            packs.append({
+                "cards": pulled_cards,
+                "pack_info": {
+                    "total_cards": len(pulled_cards),
+                    "duplicate_info": {card_id: count for card_id, count in card_counts.items() if count > 1}
+                }
+            })
+        
+        await add_cards_to_collection(request.user_id, all_pulled_cards, packs_opened=request.count)
+        await run_db(record_pack_pulls, request.user_id, request.collection_id, pulled_packs)
+        
+        return {
+            "message": f"{request.count} packs opened successfully!",
+            "collection_name": pool.collection["name"],
+            "packs": packs,
+            "total_packs": len(packs),
+            "total_cards": len(all_pulled_cards)
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error opening packs: {str(e)}")
+
+def migrate_user_collection(user_collection: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a legacy ``collected_cards`` list into per-card counts and save it"""
+    if "collected_cards" not in user_collection:
+        return user_collection
+    
+    legacy_counts = {}
+    for card in user_collection["collected_cards"]:
+        if card and card.get("id"):
+            legacy_counts[card["id"]] = legacy_counts.get(card["id"], 0) + 1
+    
+    # Added with $inc so counts recorded by concurrent pack opens are kept; the
+    # filter makes sure only one migration of the document ever applies
+    user_collections_collection.update_one(
+        {"user_id": user_collection["user_id"], "collected_cards": {"$exists": True}},
+        {
+            "$inc": {f"card_counts.{card_id}": count for card_id, count in legacy_counts.items()},
+            "$unset": {"collected_cards": ""}
+        }
+    )
+    return user_collections_collection.find_one({"user_id": user_collection["user_id"]}, {"_id": 0})
+
+def migrate_user_collections() -> int:
+    """Migrate every user collection still storing full card copies; returns how many changed"""
+    migrated = 0
+    for user_collection in user_collections_collection.find({"collected_cards": {"$exists": True}}):
+        migrate_user_collection(user_collection)
+        migrated += 1
+    return migrated
+
+def stats_from_counts(card_counts: Dict[str, int]) -> Dict[str, Any]:
+    """Build the stored user stats from per-card counts and the catalog"""
+    stats = {"total_cards": 0, "unique_cards": 0, "rarity_counts": {}, "collection_stats": {}}
+    owned = {card_id: count for card_id, count in card_counts.items() if count > 0}
+    for card in cards_collection.find({"id": {"$in": list(owned)}}, {"_id": 0, "id": 1, "rarity": 1, "collection_id": 1}):
+        count = owned[card["id"]]
+        stats["total_cards"] += count
+        stats["unique_cards"] += 1
+        rarity = card.get("rarity", "Unknown")
+        stats["rarity_counts"][rarity] = stats["rarity_counts"].get(rarity, 0) + count
+        collection_stats = stats["collection_stats"].setdefault(card.get("collection_id", "Unknown"), {"count": 0, "unique": 0})
+        collection_stats["count"] += count
+        collection_stats["unique"] += 1
+    return stats
+
+def recompute_user_stats(user_id: str) -> Optional[Dict[str, Any]]:
+    """Rebuild a user's stored stats from their card counts, repairing any drift"""
+    user_collection = user_collections_collection.find_one({"user_id": user_id}, {"_id": 0})
+    if not user_collection:
+        return None
+    user_collection = migrate_user_collection(user_collection)
+    stats = stats_from_counts(user_collection.get("card_counts", {}))
+    user_collections_collection.update_one({"user_id": user_id}, {"$set": {"stats": stats}})
+    return stats
+
+def is_stats_key(value: Any) -> bool:
+    """Whether a value can key the stored stats: pack_update_pipeline writes them by
+    dotted path, where a '.' would nest and a leading '$' fails the update"""
+    return isinstance(value, str) and value != "" and "." not in value and not value.startswith("$")
+
+def pack_update_pipeline(cards: List[Dict[str, Any]], packs_opened: int) -> List[Dict[str, Any]]:
+    """Update pipeline recording pulled cards together with the user's stats.
+    
+    Every expression in a single $set stage sees the document as it was before
+    the update, so a card counts towards ``unique`` only if it wasn't owned yet.
+    """
+    def current(path):
+        return {"$ifNull": [f"${path}", 0]}
+    
+    card_counts = {}
+    for card in cards:
+        # Cards stored before keys were checked on create would write elsewhere than
+        # recompute_user_stats does, so they fail here instead
+        for field in ("id", "collection_id", "rarity"):
+            if not is_stats_key(card[field]):
+                raise ValueError(f"Card {card['id']} has a {field} that can't key the stats: {card[field]!r}")
+        card_counts[card["id"]] = card_counts.get(card["id"], 0) + 1
+    
+    fields = {
+        "created_at": {"$ifNull": ["$created_at", datetime.now(timezone.utc)]},
+        "total_packs_opened": {"$add": [current("total_packs_opened"), packs_opened]},
+        "stats.total_cards": {"$add": [current("stats.total_cards"), len(cards)]}
+    }
+    count_fields = {}
+    unique_terms = []
+    collection_totals = {}
+    rarity_totals = {}
+    for card in {card["id"]: card for card in cards}.values():
+        count = card_counts[card["id"]]
+        count_fields[f"card_counts.{card['id']}"] = {"$add": [current(f"card_counts.{card['id']}"), count]}
+        is_new = {"$cond": [{"$gt": [current(f"card_counts.{card['id']}"), 0]}, 0, 1]}
+        unique_terms.append(is_new)
+        
+        totals = collection_totals.setdefault(card["collection_id"], {"count": 0, "unique": []})
+        totals["count"] += count
+        totals["unique"].append(is_new)
+        rarity_totals[card["rarity"]] = rarity_totals.get(card["rarity"], 0) + count
+    
+    fields["stats.unique_cards"] = {"$add": [current("stats.unique_cards")] + unique_terms}
+    for collection_id, totals in collection_totals.items():
+        path = f"stats.collection_stats.{collection_id}"
+        fields[f"{path}.count"] = {"$add": [current(f"{path}.count"), totals["count"]]}
+        fields[f"{path}.unique"] = {"$add": [current(f"{path}.unique")] + totals["unique"]}
+    for rarity, count in rarity_totals.items():
+        fields[f"stats.rarity_counts.{rarity}"] = {"$add": [current(f"stats.rarity_counts.{rarity}"), count]}
+    fields.update(count_fields)
+    
+    return [{"$set": fields}]
+
+async def add_cards_to_collection(user_id: str, cards: List[Dict[str, Any]], packs_opened: int = 1):
+    """Add opened cards to user's collection"""
+    try:
+        # One atomic upsert records the cards and the user's stats together: concurrent
+        # pack opens for the same user all count, and the write only touches the
+        # counters of the pulled cards
+        update = pack_update_pipeline(cards, packs_opened)
+        try:
+            await run_db(user_collections_collection.update_one, {"user_id": user_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # Lost an upsert race for a brand new user; the document exists now
+            await run_db(user_collections_collection.update_one, {"user_id": user_id}, update, upsert=True)
         
     except Exception as e:
+        # Raised on, so the pack isn't reported as opened when nothing was recorded
         print(f"Error adding cards to collection: {str(e)}")
+        raise
 
 @app.get("/api/user-collection/{user_id}")
-async def get_user_collection(user_id: str):
+async def get_user_collection(request: Request, user_id: str, include_cards: bool = True):
     try:
-        collection = user_collections_collection.find_one({"user_id": user_id}, {"_id": 0})
+        collection = await run_db(user_collections_collection.find_one, {"user_id": user_id}, {"_id": 0})
         if not collection:
             return {
                 "user_id": user_id,
@@ -538,42 +2812,173 @@ async def get_user_collection(user_id: str):
                 "rarity_counts": {},
                 "collection_stats": {}
             }
+        if "collected_cards" in collection or "stats" not in collection:
+            # Stored before stats were kept on the document
+            collection["stats"] = await run_db(recompute_user_stats, user_id)
+        stats = collection["stats"]
         
-        # Calculate statistics
-        collected_cards = collection.get("collected_cards", [])
-        unique_cards = len(set(card["id"] for card in collected_cards))
-        
-        # Count cards by rarity
-        rarity_counts = {}
-        for card in collected_cards:
-            rarity = card.get("rarity", "Unknown")
-            rarity_counts[rarity] = rarity_counts.get(rarity, 0) + 1
-        
-        # Count cards by collection
-        collection_stats = {}
-        for card in collected_cards:
-            coll_id = card.get("collection_id", "Unknown")
-            if coll_id not in collection_stats:
-                collection_stats[coll_id] = {"count": 0, "unique": set()}
-            collection_stats[coll_id]["count"] += 1
-            collection_stats[coll_id]["unique"].add(card["id"])
-        
-        # Convert sets to counts for JSON serialization
-        for coll_id in collection_stats:
-            collection_stats[coll_id]["unique"] = len(collection_stats[coll_id]["unique"])
-        
-        return {
+        response = {
             "user_id": user_id,
-            "collected_cards": collected_cards,
             "total_packs_opened": collection.get("total_packs_opened", 0),
-            "unique_cards": unique_cards,
-            "total_cards": len(collected_cards),
-            "rarity_counts": rarity_counts,
-            "collection_stats": collection_stats
+            "unique_cards": stats.get("unique_cards", 0),
+            "total_cards": stats.get("total_cards", 0),
+            "rarity_counts": stats.get("rarity_counts", {}),
+            "collection_stats": stats.get("collection_stats", {})
         }
+        if include_cards:
+            # Join owned card ids with the catalog; each card is returned once with its count
+            card_counts = {card_id: count for card_id, count in collection.get("card_counts", {}).items() if count > 0}
+            collected_cards = await run_db(lambda: list(cards_collection.find({"id": {"$in": list(card_counts)}}, {"_id": 0})))
+            for card in collected_cards:
+                card["count"] = card_counts[card["id"]]
+            response["collected_cards"] = collected_cards
+        return await json_response(request, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user collection: {str(e)}")
 
+@app.get("/api/user-collection/{user_id}/cards")
+async def get_user_collection_cards(
+    request: Request,
+    user_id: str,
+    collection_id: Optional[str] = None,
+    rarity: Optional[str] = None,
+    card_type: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    try:
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        
+        collection = await run_db(user_collections_collection.find_one, {"user_id": user_id}, {"_id": 0})
+        if collection:
+            collection = await run_db(migrate_user_collection, collection)
+        card_counts = {
+            card_id: count for card_id, count in (collection or {}).get("card_counts", {}).items() if count > 0
+        }
+        
+        # Page through the owned card ids in id order: one query over the ids after
+        # the cursor, reading one extra card to tell whether another page follows
+        owned = sorted(card_counts)
+        position = 0
+        if cursor is not None:
+            after = decode_cursor(cursor, 1)[0]
+            if not isinstance(after, str):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            position = bisect.bisect_right(owned, after)
+        query = {}
+        if collection_id is not None:
+            query["collection_id"] = collection_id
+        if rarity is not None:
+            query["rarity"] = rarity
+        if card_type is not None:
+            query["card_type"] = card_type
+        
+        cards = []
+        if position < len(owned):
+            query["id"] = {"$in": owned[position:]}
+            cards = await run_db(lambda: list(cards_collection.find(query, {"_id": 0}).sort("id", ASCENDING).limit(limit + 1)))
+        next_cursor = None
+        if len(cards) > limit:
+            cards = cards[:limit]
+            next_cursor = encode_cursor([cards[-1]["id"]])
+        for card in cards:
+            card["count"] = card_counts[card["id"]]
+        
+        return await json_response(request, {"user_id": user_id, "cards": cards, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching user collection cards: {str(e)}")
+
+@app.get("/api/user-collection/{user_id}/pulls")
+async def get_user_pulls(
+    request: Request,
+    user_id: str,
+    collection_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100
+):
+    try:
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        
+        query = {"meta.user_id": user_id}
+        if collection_id is not None:
+            query["meta.collection_id"] = collection_id
+        if since is not None or until is not None:
+            query["pulled_at"] = {}
+            if since is not None:
+                query["pulled_at"]["$gte"] = since
+            if until is not None:
+                query["pulled_at"]["$lt"] = until
+        
+        pulls = await run_db(lambda: list(pack_pulls_collection.find(query, {"_id": 0}).sort("pulled_at", -1).limit(limit)))
+        return await json_response(request, {"user_id": user_id, "pulls": pulls})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching pull history: {str(e)}")
+
+@app.get("/api/admin/index-stats")
+async def get_index_stats():
+    def collect():
+        stats = {}
+        for collection_name in list(REQUIRED_INDEXES) + [pack_pulls_collection.name]:
+            stats[collection_name] = {"missing": index_status.get(collection_name, {}).get("missing", [])}
+            try:
+                usage = list(db[collection_name].aggregate([{"$indexStats": {}}]))
+            except OperationFailure as e:
+                # e.g. $indexStats on a time-series collection with older servers
+                stats[collection_name].update({"available": False, "error": str(e), "indexes": []})
+                continue
+            stats[collection_name].update({
+                "available": True,
+                "indexes": [
+                    {
+                        "name": index["name"],
+                        "key": dict(index["key"]),
+                        "ops": index["accesses"]["ops"],
+                        "since": index["accesses"]["since"].isoformat()
+                    }
+                    for index in usage
+                ]
+            })
+        return stats
+    
+    try:
+        return {"collections": await run_db(collect)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching index stats: {str(e)}")
+
+@app.post("/api/admin/gc-uploads")
+async def gc_uploads_endpoint(grace_seconds: int = UPLOAD_TEMP_MAX_AGE):
+    try:
+        removed = await run_db(gc_uploads, grace_seconds)
+        return {"message": "Upload garbage collection finished", "removed": removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error collecting uploads: {str(e)}")
+
+@app.post("/api/admin/recompute-user-stats")
+async def recompute_user_stats_endpoint(user_id: Optional[str] = None):
+    try:
+        if user_id is not None:
+            stats = await run_db(recompute_user_stats, user_id)
+            if stats is None:
+                raise HTTPException(status_code=404, detail="User collection not found")
+            return {"message": "User stats recomputed", "user_id": user_id, "stats": stats}
+        
+        # No user given: repair every user collection
+        user_ids = await run_db(lambda: [doc["user_id"] for doc in user_collections_collection.find({}, {"_id": 0, "user_id": 1})])
+        for each_user_id in user_ids:
+            await run_db(recompute_user_stats, each_user_id)
+        return {"message": "User stats recomputed", "users": len(user_ids)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error recomputing user stats: {str(e)}")
+
 @app.get("/api/rarities")
 async def get_rarities():
     return {
@@ -589,13 +2994,7 @@ async def get_rarities():
 
 @app.get("/api/card-types")
 async def get_card_types():
-    return {
-        "card_types": [
-            "Pokemon",
-            "Trainer",
-            "Energy"
-        ]
-    }
+    return {"card_types": CARD_TYPES}
 
 @app.get("/api/pack-probabilities")
 async def get_pack_probabilities():
@@ -604,6 +3003,147 @@ async def get_pack_probabilities():
         "cards_per_pack": CARDS_PER_PACK
     }
 
+@app.get("/api/pack-odds/{collection_id}")
+async def get_collection_pack_odds(collection_id: str, packs: int = 200_000, collectors: int = 100, seed: Optional[int] = None):
+    try:
+        if packs < 1 or packs > MAX_SIMULATED_PACKS:
+            raise HTTPException(status_code=400, detail=f"packs must be between 1 and {MAX_SIMULATED_PACKS}")
+        if collectors < 0 or collectors > 1000:
+            raise HTTPException(status_code=400, detail="collectors must be between 0 and 1000")
+        
+        pool = await run_db(get_pack_pool, collection_id)
+        if pool is None:
+            raise HTTPException(status_code=404, detail="Collection not found")
+        if not pool.all_cards:
+            raise HTTPException(status_code=400, detail="No cards available in this collection")
+        
+        # The simulation is CPU bound; keep it off the event loop
+        return await run_in_threadpool(get_pack_odds, collection_id, packs, collectors, seed)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error simulating pack odds: {str(e)}")
+
+def benchmark_serialization(cards: int = 2000, rounds: int = 20) -> Dict[str, Any]:
+    """Time response encoders and compare body sizes on a synthetic card catalog"""
+    from fastapi.encoders import jsonable_encoder
+    
+    rng = random.Random(0)
+    rarities = list(RARITY_PROBABILITIES)
+    payload = [{
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "name": f"Card {i}",
+        "image_url": f"/uploads/{uuid.UUID(int=rng.getrandbits(128))}.png",
+        "rarity": rng.choice(rarities),
+        "card_type": rng.choice(["Pokemon", "Trainer", "Energy"]),
+        "card_number": i + 1,
+        "collection_id": "benchmark",
+    } for i in range(cards)]
+    
+    encoders = {
+        "json": lambda: json.dumps(payload).encode(),
+        "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(payload)).encode(),
+        "orjson": lambda: orjson.dumps(payload),
+    }
+    timings = {}
+    for name, encode in encoders.items():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            encode()
+        timings[name] = round((time.perf_counter() - started) / rounds * 1000, 3)
+    
+    body = orjson.dumps(payload)
+    sizes = {"identity": len(body)}
+    for encoding in supported_encodings():
+        started = time.perf_counter()
+        sizes[encoding] = len(compress_body(body, encoding))
+        timings[f"{encoding} compress"] = round((time.perf_counter() - started) * 1000, 3)
+    return {"cards": cards, "ms_per_encode": timings, "bytes": sizes}
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="TCG Pocket API server and maintenance commands")
+    commands = parser.add_subparsers(dest="command")
+    
+    simulate = commands.add_parser("simulate", help="Simulate pack odds for a collection")
+    simulate.add_argument("collection_id")
+    simulate.add_argument("--packs", type=int, default=1_000_000)
+    simulate.add_argument("--collectors", type=int, default=100)
+    simulate.add_argument("--seed", type=int, default=None)
+    
+    commands.add_parser("migrate-user-collections", help="Convert stored card copies into per-card counts")
+    
+    backfill = commands.add_parser("backfill-image-variants", help="Generate image variants for cards that lack them")
+    backfill.add_argument("--force", action="store_true", help="Regenerate variants for every uploaded image")
+    
+    gc = commands.add_parser("gc-uploads", help="Delete unreferenced image blobs and orphaned upload files")
+    gc.add_argument("--grace-seconds", type=int, default=UPLOAD_TEMP_MAX_AGE)
+    
+    mirror = commands.add_parser("mirror-images", help="Mirror URL-based card images and revalidate existing mirrors")
+    mirror.add_argument("--max-age", type=int, default=MIRROR_REVALIDATE_SECONDS, help="Seconds since a mirror was last checked")
+    
+    import_parser = commands.add_parser("import-cards", help="Bulk import cards from an NDJSON or CSV manifest")
+    import_parser.add_argument("manifest")
+    import_parser.add_argument("--images", help="Zip of the image files named in the manifest's image column")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="Defaults from the manifest's extension")
+    
+    benchmark = commands.add_parser("benchmark-serialization", help="Compare JSON encoders and response compression")
+    benchmark.add_argument("--cards", type=int, default=2000)
+    benchmark.add_argument("--rounds", type=int, default=20)
+    
+    args = parser.parse_args()
+    
+    if args.command == "simulate":
+        pool = get_pack_pool(args.collection_id)
+        if pool is None or not pool.all_cards:
+            parser.exit(1, f"Collection {args.collection_id} not found or empty\n")
+        result = simulate_pack_odds(pool, args.packs, args.collectors, seed=args.seed)
+        print(json.dumps(result, indent=2))
+    elif args.command == "migrate-user-collections":
+        print(f"Migrated {migrate_user_collections()} user collections")
+    elif args.command == "backfill-image-variants":
+        print(f"Generated image variants for {backfill_image_variants(args.force)} cards")
+    elif args.command == "gc-uploads":
+        print(json.dumps(gc_uploads(args.grace_seconds)))
+    elif args.command == "mirror-images":
+        async def mirror_images():
+            count = await revalidate_image_mirrors(args.max_age)
+            # Let variant generation for new mirrors finish before exiting
+            await asyncio.gather(*background_tasks)
+            return count
+        print(f"Checked images for {asyncio.run(mirror_images())} cards")
+    elif args.command == "import-cards":
+        started = time.perf_counter()
+        archive = zipfile.ZipFile(args.images) if args.images else None
+        inserted = []
+        
+        # Mirror or resize the new cards' images before exiting
+        async def process_images():
+            await asyncio.gather(*(
+                mirror_card_image(card["id"]) if card["source_image_url"] else generate_card_variants(card)
+                for card in inserted
+            ))
+        try:
+            with open(args.manifest, "rb") as stream:
+                result = import_cards(iter_manifest_rows(stream, manifest_format_for(args.manifest, args.format)), archive, inserted)
+        finally:
+            if archive is not None:
+                archive.close()
+            # Running servers reload these collections once they see the new versions
+            for collection_id in {card["collection_id"] for card in inserted}:
+                bump_catalog_version(collection_id)
+            asyncio.run(process_images())
+        print(json.dumps({
+            "inserted": len(result["inserted"]),
+            "errors": result["errors"],
+            "seconds": round(time.perf_counter() - started, 2)
+        }, indent=2))
+    elif args.command == "benchmark-serialization":
+        print(json.dumps(benchmark_serialization(args.cards, args.rounds), indent=2))
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    main()
\ No newline at end of file
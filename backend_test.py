@@ -1,10 +1,46 @@
 import requests
+import os
+import asyncio
 import sys
 import json
 import io
+import time
+import random
+import threading
+import zipfile
+import shutil
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
 from PIL import Image
 
+def import_backend_server():
+    """The backend module, for tests that call its functions directly (None when it can't be imported here)"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+    try:
+        import server
+        return server
+    except Exception as e:
+        print(f"   ⚠️  Backend module not importable here, skipping: {e}")
+        return None
+
+@contextlib.contextmanager
+def temporary_uploads_dir(server):
+    """Point the backend's upload store at a fresh directory for the duration of a direct test"""
+    saved = server.uploads_dir, server.variants_dir
+    directory = Path(tempfile.mkdtemp(prefix="tcg-uploads-"))
+    server.uploads_dir, server.variants_dir = directory, directory / "variants"
+    server.variants_dir.mkdir()
+    try:
+        yield directory
+    finally:
+        server.uploads_dir, server.variants_dir = saved
+        shutil.rmtree(directory, ignore_errors=True)
+
 class TCGPocketAPITester:
     def __init__(self, base_url="https://539a4b83-4cdf-429f-96e5-7480f8b042f9.preview.emergentagent.com"):
         self.base_url = base_url
@@ -204,6 +240,153 @@ class TCGPocketAPITester:
             return response['cards']
         return []
 
+    def test_get_cards_paginated(self, collection_id, limit=2):
+        """Test filtered, projected keyset pagination over /api/cards"""
+        cards, cursor = [], None
+        while True:
+            endpoint = f"api/cards?collection_id={collection_id}&fields=name&limit={limit}"
+            success, response = self.run_test(
+                f"Get Cards Page - {collection_id}",
+                "GET",
+                endpoint + (f"&cursor={cursor}" if cursor else ""),
+                200
+            )
+            if not success:
+                return False
+            cards.extend(response['cards'])
+            cursor = response.get('next_cursor')
+            if not cursor:
+                break
+
+        ids = [card['id'] for card in cards]
+        print(f"   Paged through {len(cards)} cards")
+        if len(ids) != len(set(ids)) or any(card['collection_id'] != collection_id for card in cards):
+            print("   ❌ Pages overlap or contain cards from another collection")
+            return False
+        return True
+
+    def test_bulk_import(self, collection_id, count=20):
+        """Test CSV bulk import with zipped images and per-row errors"""
+        zip_bytes = io.BytesIO()
+        with zipfile.ZipFile(zip_bytes, 'w') as archive:
+            archive.writestr('card.jpg', self.create_test_image().getvalue())
+        rows = ["name,rarity,card_type,collection_id,card_number,image"]
+        rows += [f"Imported {number},Common,Pokemon,{collection_id},{100 + number},card.jpg" for number in range(count)]
+        rows.append(f"Broken,Mythic,Pokemon,{collection_id},{100 + count},card.jpg")
+        files = {
+            'manifest': ('cards.csv', "\n".join(rows).encode(), 'text/csv'),
+            'images': ('images.zip', zip_bytes.getvalue(), 'application/zip')
+        }
+        success, response = self.run_test(
+            f"Bulk Import - {count} cards",
+            "POST",
+            "api/cards/import",
+            200,
+            data={'format': 'csv'},
+            files=files
+        )
+        if not success:
+            return False
+        print(f"   Inserted {response.get('inserted')}, failed {response.get('failed')}")
+        if response.get('inserted') != count or [error['row'] for error in response.get('errors', [])] != [count + 1]:
+            print("   ❌ Expected every valid row inserted and only the bad row reported")
+            return False
+        return True
+
+    def test_import_error_paths(self):
+        """Test that the importer turns unreadable and invalid manifest rows and zip members into per-row errors"""
+        print("\n🔍 Testing Import Error Paths...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        def row_errors(rows):
+            errors = []
+            for row in rows:
+                try:
+                    server.validate_import_row(row, {"import-test"})
+                    errors.append(None)
+                except ValueError as e:
+                    errors.append(str(e))
+            return errors
+        
+        csv_manifest = b"\n".join([
+            "\ufeffname,rarity,card_type,collection_id,card_number,image_url".encode(),
+            b"Good,Common,Pokemon,import-test,1,https://example.com/1.png",
+            b"Bad \xff bytes,Common,Pokemon,import-test,2,https://example.com/2.png",
+            b"Mythic,Mythic,Pokemon,import-test,3,https://example.com/3.png",
+            b"Elsewhere,Common,Pokemon,other-collection,4,https://example.com/4.png",
+            b"Fraction,Common,Pokemon,import-test,five,https://example.com/5.png",
+            b"No image,Common,Pokemon,import-test,6,",
+            b"After,Common,Pokemon,import-test,7,https://example.com/7.png"
+        ])
+        ndjson_manifest = b"\n".join([
+            json.dumps({"name": "Good", "rarity": "Rare", "card_type": "Energy", "collection_id": "import-test", "card_number": 1, "image": "card.jpg"}).encode(),
+            b'{"name": "Truncated", ',
+            b"[1, 2, 3]",
+            json.dumps({"name": "Flag", "rarity": "Rare", "card_type": "Energy", "collection_id": "import-test", "card_number": True, "image": "card.jpg"}).encode(),
+            json.dumps({"name": "Half", "rarity": "Rare", "card_type": "Energy", "collection_id": "import-test", "card_number": 1.5, "image": "card.jpg"}).encode()
+        ])
+        expected = {
+            "csv": (csv_manifest, [None, "not valid UTF-8", "Unknown rarity", "not found", "must be an integer", "exactly one of", None]),
+            "ndjson": (ndjson_manifest, [None, "Invalid JSON", "not an object", "must be an integer", "must be an integer"])
+        }
+        for manifest_format, (manifest, wanted) in expected.items():
+            errors = row_errors(server.iter_manifest_rows(io.BytesIO(manifest), manifest_format))
+            print(f"   {manifest_format}: {errors}")
+            if len(errors) != len(wanted) or any((error is None) != (want is None) or (want and want not in error) for error, want in zip(errors, wanted)):
+                print(f"❌ Failed - Expected {manifest_format} row errors matching {wanted}")
+                return False
+        
+        # A missing member, a member that isn't an image and one whose CRC no longer matches
+        image = self.create_test_image().getvalue()
+        zip_bytes = io.BytesIO()
+        with zipfile.ZipFile(zip_bytes, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr('notes.txt', b'not an image')
+            archive.writestr('corrupt.jpg', image)
+        damaged = bytearray(zip_bytes.getvalue())
+        damaged[damaged.index(image) + len(image) - 1] ^= 0xFF
+        with zipfile.ZipFile(io.BytesIO(bytes(damaged))) as archive:
+            for name, wanted in (("missing.jpg", "is not in the zip"), ("notes.txt", "Unsupported image type"), ("corrupt.jpg", "could not be read from the zip")):
+                try:
+                    server.store_zip_image(archive, name)
+                    error = None
+                except ValueError as e:
+                    error = str(e)
+                print(f"   {name}: {error}")
+                if error is None or wanted not in error:
+                    print(f"❌ Failed - Expected {name} to fail with {wanted!r}")
+                    return False
+        
+        self.tests_passed += 1
+        print("✅ Passed - Bad rows and zip members are reported per row")
+        return True
+
+    def test_cascade_delete_collection(self, collection_id, timeout=60):
+        """Test deleting a collection with cards through a background job"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing Cascade Delete Collection - {collection_id}...")
+        response = requests.delete(f"{self.base_url}/api/collections/{collection_id}?cascade=true")
+        if response.status_code != 202:
+            print(f"❌ Failed - Expected 202, got {response.status_code}")
+            return False
+
+        job = response.json()['job']
+        deadline = time.time() + timeout
+        while job['status'] in ('queued', 'running') and time.time() < deadline:
+            time.sleep(0.5)
+            job = requests.get(f"{self.base_url}/api/jobs/{job['id']}").json()['job']
+        print(f"   Job {job['status']}: {job['progress']}")
+
+        remaining = requests.get(f"{self.base_url}/api/cards?collection_id={collection_id}").json()['cards']
+        if job['status'] != 'completed' or remaining:
+            print(f"❌ Failed - {len(remaining)} cards left, error: {job.get('error')}")
+            return False
+        self.tests_passed += 1
+        print("✅ Passed - Collection and its cards deleted")
+        return True
+
     def test_get_pack_probabilities(self):
         """Test pack probabilities endpoint"""
         success, response = self.run_test(
@@ -217,6 +400,85 @@ class TCGPocketAPITester:
             print(f"   Cards per pack: {response['cards_per_pack']}")
         return success
 
+    def test_get_pack_odds(self, collection_id, packs=20000):
+        """Test simulated per-card pack odds for a collection"""
+        success, response = self.run_test(
+            f"Get Pack Odds - Collection {collection_id}",
+            "GET",
+            f"api/pack-odds/{collection_id}?packs={packs}&collectors=20",
+            200
+        )
+        if success and 'cards' in response:
+            copies_per_pack = sum(card['expected_copies_per_pack'] for card in response['cards'])
+            print(f"   Simulated {response['packs_simulated']} packs")
+            print(f"   Set completion: {response['set_completion']}")
+            if abs(copies_per_pack - response['cards_per_pack']) > 0.01:
+                print(f"   ❌ Expected {response['cards_per_pack']} cards per pack, odds sum to {copies_per_pack:.3f}")
+                return False
+        return success
+
+    def test_alias_table(self):
+        """Test that the rarity alias tables reproduce RARITY_PROBABILITIES exactly"""
+        print("\n🔍 Testing Alias Tables...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        # Each outcome's chance is its own column's share plus what other columns alias to it
+        weights = list(server.RARITY_PROBABILITIES.values()) + [0.0]
+        table = server.AliasTable(list(range(len(weights))), weights)
+        for outcome, weight in enumerate(weights):
+            chance = table.prob[outcome] + sum(1 - table.prob[column] for column, alias in enumerate(table.alias) if alias == outcome and column != outcome)
+            if abs(chance / len(weights) - weight / sum(weights)) > 1e-9:
+                print(f"❌ Failed - Alias table gives outcome {outcome} {chance / len(weights):.6f}, expected {weight / sum(weights):.6f}")
+                return False
+        
+        self.tests_passed += 1
+        print("✅ Passed - Alias tables are exact")
+        return True
+
+    def test_pack_simulator(self, packs=200000, rolled=50000):
+        """Test the NumPy pack simulator directly against PackPool.roll_pack"""
+        print("\n🔍 Testing Pack Simulator...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        # A lone Secret Rare and Ultra Rare keep the per-pack copy cap in play
+        cards = [
+            {"id": f"card-{number}", "name": f"Card {number}", "card_number": number, "rarity": rarity, "card_type": card_type}
+            for number, (rarity, card_type) in enumerate([
+                ("Common", "Energy"), ("Common", "Energy"), ("Common", "Trainer"), ("Uncommon", "Trainer"),
+                ("Common", "Pokemon"), ("Common", "Pokemon"), ("Uncommon", "Pokemon"), ("Rare", "Pokemon"),
+                ("Holo", "Pokemon"), ("Ultra Rare", "Pokemon"), ("Secret Rare", "Pokemon")
+            ], start=1)
+        ]
+        pool = server.PackPool({"id": "alias-test", "name": "Alias Test"}, cards)
+        odds = server.simulate_pack_odds(pool, packs, collectors=0, seed=7)
+        
+        rng = random.Random(7)
+        copies = {card["id"]: 0 for card in cards}
+        for _ in range(rolled):
+            pulled, counts = pool.roll_pack(rng)
+            if len(pulled) != server.CARDS_PER_PACK or max(counts.values()) > server.MAX_COPIES_PER_PACK:
+                print(f"❌ Failed - roll_pack gave a malformed pack: {counts}")
+                return False
+            for card_id, count in counts.items():
+                copies[card_id] += count
+        
+        for card in odds["cards"]:
+            rolled_copies = copies[card["id"]] / rolled
+            print(f"   #{card['card_number']} {card['rarity']} {card['card_type']}: simulated {card['expected_copies_per_pack']:.4f}, rolled {rolled_copies:.4f}")
+            if abs(card["expected_copies_per_pack"] - rolled_copies) > 0.02:
+                print(f"❌ Failed - Simulator and roll_pack disagree on {card['name']}")
+                return False
+        
+        self.tests_passed += 1
+        print("✅ Passed - The simulator matches roll_pack")
+        return True
+
     def test_open_random_pack(self, collection_id, user_id="test_user"):
         """Test opening a random pack from collection - NEW: 6 cards with guaranteed Energy + Trainer"""
         pack_data = {
@@ -274,6 +536,39 @@ class TCGPocketAPITester:
                 
         return success
 
+    def test_open_multiple_packs(self, collection_id, count=5, user_id="test_user"):
+        """Test opening several packs in one request"""
+        pack_data = {
+            "collection_id": collection_id,
+            "user_id": user_id,
+            "count": count
+        }
+        
+        success, response = self.run_test(
+            f"Open {count} Packs - Collection {collection_id}",
+            "POST",
+            "api/open-packs",
+            200,
+            data=pack_data
+        )
+        
+        if success and 'packs' in response:
+            packs = response['packs']
+            print(f"   Opened {len(packs)} packs, {response.get('total_cards', 0)} cards in total")
+            
+            if len(packs) != count:
+                print(f"   ❌ Expected {count} packs, got {len(packs)}")
+                return False
+            
+            for index, pack in enumerate(packs, start=1):
+                types = [card['card_type'] for card in pack['cards']]
+                if len(pack['cards']) != 6 or 'Energy' not in types or 'Trainer' not in types:
+                    print(f"   ❌ Pack {index} has wrong composition: {types}")
+                    return False
+            print(f"   ✅ Every pack has 6 cards with guaranteed Energy + Trainer")
+        
+        return success
+
     def test_get_user_collection(self, user_id="test_user"):
         """Test getting user collection"""
         success, response = self.run_test(
@@ -329,6 +624,305 @@ class TCGPocketAPITester:
             return response
         return None
 
+    def test_image_blob_sharing(self):
+        """Test that identical uploads share one stored file, kept until the last card using it lets go"""
+        print("\n🔍 Testing Image Blob Sharing...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        content = self.create_test_image().getvalue() + os.urandom(16)  # Unique, so no stored blob matches
+        sha256 = hashlib.sha256(content).hexdigest()
+        try:
+            with temporary_uploads_dir(server) as directory:
+                def upload():
+                    tmp_path = directory / f".upload-{random.getrandbits(64):x}.tmp"
+                    tmp_path.write_bytes(content)
+                    return server.acquire_image_blob(tmp_path, "jpg", sha256)
+                
+                first_url, second_url = upload(), upload()
+                stored = [path for path in directory.iterdir() if path.is_file() and not path.name.startswith(".")]
+                if first_url != second_url or len(stored) != 1:
+                    print(f"❌ Failed - Identical uploads stored as {first_url} and {second_url} ({len(stored)} files)")
+                    return False
+                path = server.upload_path(first_url)
+                variant = server.variants_dir / f"{path.stem}-thumb.webp"
+                variant.write_bytes(b"variant")
+                
+                server.release_image(first_url)
+                if not path.exists() or not variant.exists():
+                    print("❌ Failed - Deleting one of two cards using an image removed its file")
+                    return False
+                server.release_image(second_url)
+                if path.exists() or variant.exists():
+                    print("❌ Failed - Deleting the last card using an image left its file or variants behind")
+                    return False
+                if server.image_blobs_collection.find_one({"sha256": sha256}) is not None:
+                    print("❌ Failed - The blob document outlived its last reference")
+                    return False
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        finally:
+            server.image_blobs_collection.delete_many({"sha256": sha256})
+        
+        self.tests_passed += 1
+        print("✅ Passed - Identical uploads share a file, removed with its variants by the last release")
+        return True
+
+    def test_gc_uploads_legacy_files(self):
+        """Test that gc_uploads removes orphaned files but keeps pre-blob-store {card_id}.ext images cards still use"""
+        print("\n🔍 Testing Upload GC With Legacy Files...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        card_id = f"gc-test-{random.getrandbits(64):x}"
+        try:
+            with temporary_uploads_dir(server) as directory:
+                legacy = directory / f"{card_id}.png"
+                legacy_variant = server.variants_dir / f"{card_id}-thumb.webp"
+                orphan = directory / f"{card_id}-orphan.png"
+                orphan_variant = server.variants_dir / f"{card_id}-orphan-thumb.webp"
+                for path in (legacy, legacy_variant, orphan, orphan_variant):
+                    path.write_bytes(b"image")
+                    os.utime(path, (time.time() - 3600, time.time() - 3600))
+                server.cards_collection.insert_one({
+                    "id": card_id, "name": "GC Test", "rarity": "Common", "card_type": "Pokemon",
+                    "collection_id": card_id, "card_number": 1, "image_url": f"/uploads/{legacy.name}"
+                })
+                
+                removed = server.gc_uploads(grace_seconds=60)
+                if not legacy.exists() or not legacy_variant.exists():
+                    print("❌ Failed - gc_uploads removed a legacy image a card still uses")
+                    return False
+                if orphan.exists() or orphan_variant.exists():
+                    print(f"❌ Failed - gc_uploads left orphaned files behind: {removed}")
+                    return False
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        finally:
+            server.cards_collection.delete_many({"id": card_id})
+        
+        self.tests_passed += 1
+        print("✅ Passed - gc_uploads keeps referenced legacy files and removes orphans")
+        return True
+
+    def test_cached_static_files(self):
+        """Test CachedStaticFiles on a temporary directory: ETags and 304s, byte ranges and the WebP alternate"""
+        print("\n🔍 Testing Cached Static Files...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        
+        directory = Path(tempfile.mkdtemp(prefix="tcg-static-"))
+        try:
+            content = bytes(range(256)) * 4
+            (directory / "card.png").write_bytes(content)
+            (directory / "variants").mkdir()
+            (directory / "variants" / "card-full.webp").write_bytes(b"webp alternate")
+            app = FastAPI()
+            app.mount("/static", server.CachedStaticFiles(
+                directory=str(directory), immutable_names=server.CONTENT_ADDRESSED_UPLOAD, alternates_dir="variants"
+            ))
+            client = TestClient(app)
+            size = len(content)
+            
+            def check(description, response, status_code, body=None, **headers):
+                problems = [] if response.status_code == status_code else [f"status {response.status_code}"]
+                if body is not None and response.content != body:
+                    problems.append(f"{len(response.content)} byte body")
+                for name, value in headers.items():
+                    if response.headers.get(name.replace("_", "-")) != value:
+                        problems.append(f"{name.replace('_', '-')}: {response.headers.get(name.replace('_', '-'))}")
+                if problems:
+                    print(f"❌ Failed - {description}: expected {status_code}, got {', '.join(problems)}")
+                return not problems
+            
+            response = client.get("/static/card.png")
+            etag = response.headers.get("etag")
+            checks = [
+                check("Plain GET", response, 200, content, cache_control="no-cache", accept_ranges="bytes"),
+                check("Current ETag", client.get("/static/card.png", headers={"If-None-Match": etag}), 304),
+                check("Weak form of the ETag", client.get("/static/card.png", headers={"If-None-Match": f"W/{etag}"}), 304),
+                check("Stale ETag", client.get("/static/card.png", headers={"If-None-Match": '"stale"'}), 200, content),
+                check("Byte range", client.get("/static/card.png", headers={"Range": "bytes=10-19"}), 206, content[10:20], content_range=f"bytes 10-19/{size}"),
+                check("Open-ended range", client.get("/static/card.png", headers={"Range": f"bytes={size - 4}-"}), 206, content[-4:]),
+                check("Suffix range", client.get("/static/card.png", headers={"Range": "bytes=-5"}), 206, content[-5:], content_range=f"bytes {size - 5}-{size - 1}/{size}"),
+                check("Range past the end", client.get("/static/card.png", headers={"Range": f"bytes={size}-"}), 416, content_range=f"bytes */{size}"),
+                check("Range for an older version", client.get("/static/card.png", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}), 200, content)
+            ]
+            for malformed in ("bytes=5-3", "bytes=abc", "bytes=0-1,4-5", "lines=0-9", "bytes="):
+                checks.append(check(f"Malformed range {malformed!r}", client.get("/static/card.png", headers={"Range": malformed}), 200, content))
+            checks += [
+                check("WebP alternate", client.get("/static/card.png", headers={"Accept": "image/webp,*/*"}), 200, b"webp alternate", content_type="image/webp", vary="Accept"),
+                check("WebP refused", client.get("/static/card.png", headers={"Accept": "image/webp;q=0,*/*"}), 200, content),
+                check("Wildcard Accept", client.get("/static/card.png", headers={"Accept": "*/*"}), 200, content)
+            ]
+            if not all(checks):
+                return False
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        
+        self.tests_passed += 1
+        print("✅ Passed - ETags, byte ranges and alternates are served as expected")
+        return True
+
+    def test_concurrent_load(self, calls=16, delay_ms=250):
+        """Load test: slow database calls through run_db, awaited one at a time and then together.
+        
+        Each call is a find with a server-side `$where: sleep`, so the database is the
+        bottleneck: together they may only take as long as one round of the Mongo thread
+        pool, and the event loop must keep running while they are in flight.
+        """
+        print(f"\n🔍 Testing Concurrent Load ({calls} slow queries of {delay_ms}ms)...")
+        server = import_backend_server()
+        if server is None:
+            return True
+        self.tests_run += 1
+        
+        scratch = server.db["load_test"]
+        slow_query = {"$where": f"sleep({delay_ms}) || true"}
+        
+        async def scenario():
+            start = time.perf_counter()
+            for _ in range(calls):
+                await server.run_db(scratch.find_one, slow_query)
+            sequential_time = time.perf_counter() - start
+            
+            # A ticker measures the longest stall of the event loop while the queries run
+            done = asyncio.Event()
+            async def ticker():
+                longest, last = 0.0, time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(0.01)
+                    now = time.perf_counter()
+                    longest, last = max(longest, now - last), now
+                return longest
+            
+            tick_task = asyncio.create_task(ticker())
+            start = time.perf_counter()
+            await asyncio.gather(*(server.run_db(scratch.find_one, slow_query) for _ in range(calls)))
+            concurrent_time = time.perf_counter() - start
+            done.set()
+            return sequential_time, concurrent_time, await tick_task
+        
+        try:
+            scratch.insert_one({"_id": "load-test"})
+            sequential_time, concurrent_time, stall = asyncio.run(scenario())
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        finally:
+            scratch.drop()
+        
+        threads = min(calls, server.MONGO_THREADS)
+        speedup = sequential_time / concurrent_time if concurrent_time else float('inf')
+        print(f"   Sequential: {sequential_time:.2f}s, concurrent: {concurrent_time:.2f}s ({speedup:.1f}x, {threads} Mongo threads)")
+        print(f"   Longest event loop stall: {stall * 1000:.0f}ms")
+        
+        if sequential_time < calls * delay_ms / 1000 * 0.9:
+            print(f"❌ Failed - The queries did not sleep; is server-side JavaScript enabled?")
+            return False
+        if speedup < threads / 2:
+            print(f"❌ Failed - Database calls are not run in parallel")
+            return False
+        if stall > delay_ms / 1000 / 2:
+            print(f"❌ Failed - The event loop was blocked by a database call")
+            return False
+        
+        self.tests_passed += 1
+        print(f"✅ Passed - Database calls run in parallel off the event loop")
+        return True
+
+    def test_mirror_url_image(self, image_host="127.0.0.1", timeout=30):
+        """Test that a URL-based card image is mirrored locally, using a local HTTP stand-in for the origin.
+
+        The backend must be able to reach image_host, so run this against a local server
+        started with MIRROR_ALLOW_PRIVATE=1 (mirroring refuses non-public addresses otherwise).
+        """
+        image = self.create_test_image().getvalue()
+        requests_seen = []
+
+        class OriginHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests_seen.append(self.headers.get('If-None-Match'))
+                if self.headers.get('If-None-Match') == '"origin-v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(image)))
+                self.send_header('ETag', '"origin-v1"')
+                self.end_headers()
+                self.wfile.write(image)
+
+            def log_message(self, *args):
+                pass
+
+        origin = ThreadingHTTPServer((image_host, 0), OriginHandler)
+        threading.Thread(target=origin.serve_forever, daemon=True).start()
+        source_url = f"http://{image_host}:{origin.server_port}/mirror-test.jpg"
+
+        try:
+            collection_id = self.test_create_collection("Mirror Test Collection", total_cards_in_set=1)
+            if not collection_id:
+                return False
+            success, response = self.run_test(
+                "Create Card From URL - Mirrored Image",
+                "POST",
+                "api/cards-from-url",
+                200,
+                data={
+                    "name": "Mirrored Card",
+                    "rarity": "Common",
+                    "card_type": "Pokemon",
+                    "collection_id": collection_id,
+                    "card_number": 1,
+                    "image_url": source_url
+                }
+            )
+            if not success:
+                return False
+            card_id = response['card']['id']
+            self.created_cards.append(card_id)
+
+            self.tests_run += 1
+            print("\n🔍 Testing Image Mirroring...")
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                cards = requests.get(f"{self.base_url}/api/cards/collection/{collection_id}").json()['cards']
+                card = next((card for card in cards if card['id'] == card_id), {})
+                if card.get('image_url', '').startswith('/uploads/'):
+                    break
+                time.sleep(0.5)
+            else:
+                print(f"❌ Failed - Image was not mirrored within {timeout}s")
+                return False
+
+            image_response = requests.get(f"{self.base_url}{card['image_url']}")
+            if image_response.status_code != 200 or image_response.content != image:
+                print("❌ Failed - Mirrored image does not match the origin")
+                return False
+            print(f"   Mirrored {card['source_image_url']} -> {card['image_url']}")
+            print(f"   Origin requests: {len(requests_seen)}")
+            self.tests_passed += 1
+            print("✅ Passed - Image served from the local mirror")
+            return True
+        finally:
+            origin.shutdown()
+
     def test_user_authentication_system(self):
         """Test the complete user authentication and separation system"""
         print("\n🔐 Testing User Authentication & Separation System")
@@ -588,6 +1182,36 @@ def main():
     # Test the complete user authentication system
     auth_success = tester.test_user_authentication_system()
     
+    # Multi-pack opening, simulated odds and card pagination on the collection set up above
+    if tester.created_collections:
+        collection_id = tester.created_collections[0]
+        tester.test_open_multiple_packs(collection_id)
+        tester.test_get_pack_odds(collection_id)
+        tester.test_get_cards_paginated(collection_id)
+    
+    # Alias tables, the simulator and importer error handling, called directly
+    tester.test_alias_table()
+    tester.test_pack_simulator()
+    tester.test_import_error_paths()
+    tester.test_image_blob_sharing()
+    tester.test_gc_uploads_legacy_files()
+    tester.test_cached_static_files()
+    
+    # Bulk import into a throwaway collection, then cascade-delete it
+    time.sleep(1)  # Collection ids are taken from the clock's seconds
+    import_collection_id = tester.test_create_collection("Bulk Import Set", "Test collection for import and cascade delete", 200)
+    if import_collection_id:
+        tester.test_bulk_import(import_collection_id)
+        tester.test_cascade_delete_collection(import_collection_id)
+    
+    # Slow database calls must run in parallel, off the event loop (called directly)
+    tester.test_concurrent_load()
+    
+    # URL-based images are mirrored from a local origin stand-in (needs a backend on this
+    # host that allows private addresses; set MIRROR_ALLOW_PRIVATE=1 for both)
+    if ("localhost" in tester.base_url or "127.0.0.1" in tester.base_url) and os.environ.get("MIRROR_ALLOW_PRIVATE"):
+        tester.test_mirror_url_image()
+    
     # Print final results
     print("\n" + "=" * 65)
     print(f"📊 Final Results: {tester.tests_passed}/{tester.tests_run} tests passed")
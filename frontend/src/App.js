@@ -23,6 +23,55 @@ const RARITY_CONFIG = {
   'Secret Rare': { icon: <Diamond className="w-4 h-4 text-pink-500" />, color: 'bg-pink-100 text-pink-800', glow: 'shadow-pink-200', sortOrder: 6 }
 };
 
+// Card fields the admin card list asks the API for
+const ADMIN_CARD_FIELDS = 'id,name,rarity,card_type,card_number,collection_id';
+
+// Resized WebP variant of a card image when the server has generated one, else the original
+const cardImageUrl = (card, size) => card.image_variants?.[size]?.webp || card.image_url;
+
+// One card's tile from a collection's sprite sheets, scaled to the given height
+const SpriteImage = ({ sprite, cardId, height, alt }) => {
+  const [sheetIndex, x, y] = sprite.cards[cardId];
+  const sheet = sprite.sheets[sheetIndex];
+  const scale = height / sprite.tile_height;
+  return (
+    <div
+      role="img"
+      aria-label={alt}
+      style={{
+        width: sprite.tile_width * scale,
+        height: height,
+        backgroundImage: `url(${BACKEND_URL}${sheet.url})`,
+        backgroundSize: `${sheet.width * scale}px ${sheet.height * scale}px`,
+        backgroundPosition: `-${x * scale}px -${y * scale}px`,
+        backgroundRepeat: 'no-repeat'
+      }}
+    />
+  );
+};
+
+// Expand a compact collection overview (presence bitmap + existing cards) into one entry per slot
+const expandCollectionOverview = (overview) => {
+  const present = atob(overview.present || '');
+  const cardsByNumber = {};
+  (overview.cards || []).forEach(card => {
+    if (!(card.card_number in cardsByNumber)) {
+      cardsByNumber[card.card_number] = card;
+    }
+  });
+  
+  const completeSet = [];
+  for (let number = 1; number <= overview.total_cards_in_set; number++) {
+    const exists = ((present.charCodeAt((number - 1) >> 3) >> ((number - 1) & 7)) & 1) === 1;
+    completeSet.push({
+      card_number: number,
+      exists: exists,
+      card: exists ? cardsByNumber[number] : null
+    });
+  }
+  return { ...overview, complete_set: completeSet };
+};
+
 // Welcome Modal Component (defined outside main component to prevent re-renders)
 const WelcomeModal = ({ tempUsername, onTempUsernameChange, handleWelcomeSubmit }) => (
   <div className="fixed inset-0 bg-black bg-opacity-50 z-50 flex items-center justify-center p-4">
@@ -82,6 +131,8 @@ const AdminTabs = ({
   handleCardSubmit,
   collections,
   cards,
+  cardsCursor,
+  fetchCards,
   handleDeleteCollection,
   handleDeleteCard,
   RARITY_CONFIG 
@@ -340,7 +391,7 @@ const AdminTabs = ({
         </Card>
         <Card>
           <CardHeader>
-            <CardTitle>All Cards ({cards.length})</CardTitle>
+            <CardTitle>All Cards ({cards.length}{cardsCursor ? '+' : ''})</CardTitle>
           </CardHeader>
           <CardContent>
             <div className="space-y-4 max-h-96 overflow-y-auto">
@@ -394,6 +445,11 @@ const AdminTabs = ({
               {cards.length === 0 && (
                 <p className="text-gray-500 text-center">No cards created yet</p>
               )}
+              {cardsCursor && (
+                <Button variant="outline" className="w-full" onClick={() => fetchCards(cardsCursor)}>
+                  Load more cards
+                </Button>
+              )}
             </div>
           </CardContent>
         </Card>
@@ -410,8 +466,10 @@ function App() {
   
   const [isAdminMode, setIsAdminMode] = useState(false);
   const [cards, setCards] = useState([]);
+  const [cardsCursor, setCardsCursor] = useState(null);
   const [collections, setCollections] = useState([]);
   const [userCollection, setUserCollection] = useState({});
+  const [userCardsCursor, setUserCardsCursor] = useState(null);
   const [pulledCards, setPulledCards] = useState([]);
   const [loading, setLoading] = useState(false);
   const [activeTab, setActiveTab] = useState('welcome');
@@ -423,6 +481,7 @@ function App() {
   const [sortBy, setSortBy] = useState('number'); // 'number', 'name', 'rarity'
   const [showMissingCards, setShowMissingCards] = useState(true);
   const [collectionOverview, setCollectionOverview] = useState(null);
+  const [overviewCounts, setOverviewCounts] = useState({});
 
   // Collection creation form state
   const [collectionForm, setCollectionForm] = useState({
@@ -487,11 +546,15 @@ function App() {
     }
   }, [userCollection]);
 
-  const fetchCards = async () => {
+  const fetchCards = async (cursor = null) => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/cards`);
+      // The admin list only needs these fields; pages are loaded on demand
+      const params = new URLSearchParams({ fields: ADMIN_CARD_FIELDS, limit: 100 });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${BACKEND_URL}/api/cards?${params}`);
       const data = await response.json();
-      setCards(data.cards || []);
+      setCards(previous => cursor ? [...previous, ...(data.cards || [])] : (data.cards || []));
+      setCardsCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching cards:', error);
     }
@@ -521,6 +584,7 @@ function App() {
     setCurrentUser('');
     localStorage.removeItem('tcg-username');
     setUserCollection({});
+    setOverviewCounts({});
     setPulledCards([]);
     setShowWelcomeModal(true);
     setActiveTab('welcome');
@@ -539,13 +603,28 @@ function App() {
     setTempUsername(value);
   }, []);
 
-  const fetchUserCollection = async () => {
+  const fetchUserCollection = async (cursor = null) => {
     if (!currentUser) return;
     
     try {
-      const response = await fetch(`${BACKEND_URL}/api/user-collection/${currentUser}`);
-      const data = await response.json();
-      setUserCollection(data);
+      // Stats come without the card list; owned cards are loaded a page at a time
+      const user = encodeURIComponent(currentUser);
+      const params = new URLSearchParams({ limit: '200' });
+      if (cursor) params.set('cursor', cursor);
+      const pageResponse = await fetch(`${BACKEND_URL}/api/user-collection/${user}/cards?${params}`);
+      const page = await pageResponse.json();
+      
+      if (cursor) {
+        setUserCollection(previous => ({
+          ...previous,
+          collected_cards: [...(previous.collected_cards || []), ...(page.cards || [])]
+        }));
+      } else {
+        const response = await fetch(`${BACKEND_URL}/api/user-collection/${user}?include_cards=false`);
+        const data = await response.json();
+        setUserCollection({ ...data, collected_cards: page.cards || [] });
+      }
+      setUserCardsCursor(page.next_cursor || null);
     } catch (error) {
       console.error('Error fetching user collection:', error);
     }
@@ -558,9 +637,29 @@ function App() {
         const firstCard = userCollection.collected_cards[0];
         const collectionId = firstCard.collection_id;
         
-        const response = await fetch(`${BACKEND_URL}/api/collection-overview/${collectionId}`);
+        // Prefer the static bundle (immutable, cached by the browser); fall back to the API
+        const manifestResponse = await fetch(`${BACKEND_URL}/api/catalog-bundles`);
+        const manifest = await manifestResponse.json();
+        const bundle = (manifest.bundles || {})[collectionId];
+        const response = await fetch(bundle
+          ? `${BACKEND_URL}${bundle.url}`
+          : `${BACKEND_URL}/api/collection-overview/${collectionId}?format=compact`);
         const data = await response.json();
-        setCollectionOverview(data);
+        
+        // The overview shows every owned card of the set, not just the loaded pages
+        const user = encodeURIComponent(currentUser);
+        const counts = {};
+        let cursor = null;
+        do {
+          const params = new URLSearchParams({ collection_id: collectionId, limit: '500' });
+          if (cursor) params.set('cursor', cursor);
+          const pageResponse = await fetch(`${BACKEND_URL}/api/user-collection/${user}/cards?${params}`);
+          const page = await pageResponse.json();
+          (page.cards || []).forEach(card => { counts[card.id] = card.count; });
+          cursor = page.next_cursor;
+        } while (cursor);
+        setOverviewCounts(counts);
+        setCollectionOverview(expandCollectionOverview(data));
       }
     } catch (error) {
       console.error('Error fetching collection overview:', error);
@@ -707,26 +806,45 @@ function App() {
   };
 
   const handleDeleteCollection = async (collectionId, collectionName) => {
-    if (!confirm(`Are you sure you want to delete the collection "${collectionName}"? This cannot be undone.`)) {
+    if (!confirm(`Are you sure you want to delete the collection "${collectionName}" and all of its cards? This cannot be undone.`)) {
       return;
     }
 
     setLoading(true);
     try {
-      const response = await fetch(`${BACKEND_URL}/api/collections/${collectionId}`, {
+      const response = await fetch(`${BACKEND_URL}/api/collections/${collectionId}?cascade=true`, {
         method: 'DELETE'
       });
 
       if (response.ok) {
+        // Cards are removed by a background job; poll it until it finishes (or give up after 5 minutes)
+        let { job } = await response.json();
+        const deadline = Date.now() + 5 * 60 * 1000;
+        while ((job.status === 'queued' || job.status === 'running') && Date.now() < deadline) {
+          await new Promise(resolve => setTimeout(resolve, 1000));
+          const jobResponse = await fetch(`${BACKEND_URL}/api/jobs/${job.id}`);
+          if (!jobResponse.ok) {
+            throw new Error(`job status request failed with ${jobResponse.status}`);
+          }
+          ({ job } = await jobResponse.json());
+        }
         fetchCollections();
-        alert('Collection deleted successfully!');
+        fetchCards();
+        if (job.status === 'completed') {
+          alert(`Collection deleted successfully! (${job.progress.cards_deleted} cards removed)`);
+        } else if (job.status === 'failed') {
+          alert('Error deleting collection: ' + (job.error || 'Unknown error'));
+        } else {
+          alert(`Collection deletion is still running in the background (${job.progress.cards_deleted} of ${job.progress.cards_total} cards removed). Refresh later to see the result.`);
+        }
       } else {
         const errorData = await response.json();
         alert('Error deleting collection: ' + (errorData.detail || 'Unknown error'));
       }
     } catch (error) {
       console.error('Error deleting collection:', error);
-      alert('Error deleting collection');
+      alert('Error deleting collection: ' + error.message);
+      fetchCollections();
     } finally {
       setLoading(false);
     }
@@ -850,7 +968,7 @@ function App() {
               owned: true
             };
           }
-          cardGroups[card.id].quantity++;
+          cardGroups[card.id].quantity += card.count || 1;
         }
       });
       return sortCards(Object.values(cardGroups));
@@ -863,14 +981,14 @@ function App() {
       // Show complete set with missing cards
       displayCards = collectionOverview.complete_set.map(item => {
         if (item.exists) {
-          // Group owned cards by ID and count quantities
-          const ownedCards = userCollection.collected_cards?.filter(card => card && card.id === item.card?.id) || [];
+          // Counts for the whole set, loaded with the overview
+          const quantity = overviewCounts[item.card?.id] || 0;
           return {
             card_number: item.card_number,
             exists: true,
             card: item.card,
-            quantity: ownedCards.length,
-            owned: ownedCards.length > 0
+            quantity: quantity,
+            owned: quantity > 0
           };
         } else {
           return {
@@ -896,7 +1014,7 @@ function App() {
               owned: true
             };
           }
-          cardGroups[card.id].quantity++;
+          cardGroups[card.id].quantity += card.count || 1;
         }
       });
       displayCards = Object.values(cardGroups);
@@ -949,10 +1067,16 @@ function App() {
           <div className="relative bg-gray-100">
             {imageError || !card.image_url ? (
               <PlaceholderCard />
+            ) : collectionOverview?.sprite?.cards?.[card.id] ? (
+              // The grid shares a sprite sheet request per hundred cards
+              <div className="w-full h-64 flex items-center justify-center bg-white">
+                <SpriteImage sprite={collectionOverview.sprite} cardId={card.id} height={256} alt={card.name} />
+              </div>
             ) : (
               <img 
-                src={card.image_url} 
+                src={cardImageUrl(card, 'medium')} 
                 alt={card.name}
+                loading="lazy"
                 className="w-full h-64 object-contain bg-white"
                 onError={() => setImageError(true)}
                 onLoad={() => setImageError(false)}
@@ -1058,7 +1182,7 @@ function App() {
                 <LargePlaceholderCard />
               ) : (
                 <img 
-                  src={card.image_url} 
+                  src={cardImageUrl(card, 'large')} 
                   alt={card.name}
                   className="w-full h-[500px] object-contain bg-white"
                   onError={() => setImageError(true)}
@@ -1406,7 +1530,7 @@ function App() {
           </Card>
           <Card>
             <CardHeader>
-              <CardTitle>All Cards ({cards.length})</CardTitle>
+              <CardTitle>All Cards ({cards.length}{cardsCursor ? '+' : ''})</CardTitle>
             </CardHeader>
             <CardContent>
               <div className="space-y-4 max-h-96 overflow-y-auto">
@@ -1460,6 +1584,11 @@ function App() {
                 {cards.length === 0 && (
                   <p className="text-gray-500 text-center">No cards created yet</p>
                 )}
+                {cardsCursor && (
+                  <Button variant="outline" className="w-full" onClick={() => fetchCards(cardsCursor)}>
+                    Load more cards
+                  </Button>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -1727,6 +1856,12 @@ function App() {
           ))}
         </div>
 
+        {userCardsCursor && (
+          <Button variant="outline" className="w-full" onClick={() => fetchUserCollection(userCardsCursor)}>
+            Load more cards
+          </Button>
+        )}
+
         {(!userCollection.collected_cards || userCollection.collected_cards.length === 0) && (
           <div className="text-center py-12">
             <Trophy className="w-16 h-16 mx-auto text-gray-400 mb-4" />
@@ -1861,6 +1996,8 @@ function App() {
               handleCardSubmit={handleCardSubmit}
               collections={collections}
               cards={cards}
+              cardsCursor={cardsCursor}
+              fetchCards={fetchCards}
               handleDeleteCollection={handleDeleteCollection}
               handleDeleteCard={handleDeleteCard}
               RARITY_CONFIG={RARITY_CONFIG}